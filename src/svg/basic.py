@@ -22,6 +22,14 @@ def color_fader(c1='#000000', c2='#ffffff', mix=0):
     return mpl.colors.to_hex((1 - mix) * c1 + mix * c2)
 
 
+def color_fader_array(mix, c1='#000000', c2='#ffffff'):
+    """ vectorized color_fader, mix is an array, returns an array of hex colors """
+    c1 = np.array(mpl.colors.to_rgb(c1))
+    c2 = np.array(mpl.colors.to_rgb(c2))
+    mix = np.asarray(mix, dtype=np.float64)[..., None]
+    return convert_rgb_array(np.rint(((1 - mix) * c1 + mix * c2) * 255), alpha=None)
+
+
 def random_color_generator():
     """ random a css common string color """
     # css_colors = list(mcolors.CSS4_COLORS.keys())
@@ -92,6 +100,23 @@ def convert_rgb(rgb, alpha=0xff):
     return f'#{int(rgb[0]):02x}{int(rgb[1]):02x}{int(rgb[2]):02x}{alpha:02x}'
 
 
+_HEX_DIGITS = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+
+
+def convert_rgb_array(rgb, alpha=0xff):
+    """ vectorized convert_rgb, rgb is a (..., 3) array, returns an array of hex colors,
+    the alpha channel is omitted when alpha is None """
+    rgb = np.asarray(rgb)
+    channels = rgb[..., :3].astype(np.uint8)  # truncated as int() in convert_rgb
+    if alpha is not None:
+        channels = np.concatenate((channels, np.full(channels.shape[:-1] + (1,), alpha, dtype=np.uint8)), axis=-1)
+    chars = np.empty(channels.shape[:-1] + (1 + 2 * channels.shape[-1],), dtype=np.uint8)
+    chars[..., 0] = ord('#')
+    chars[..., 1::2] = _HEX_DIGITS[channels >> 4]
+    chars[..., 2::2] = _HEX_DIGITS[channels & 0xf]
+    return chars.view(f'S{chars.shape[-1]}')[..., 0].astype(str)
+
+
 def clip_float(x, n=1):
     """ clip float number """
     if isinstance(x, float):
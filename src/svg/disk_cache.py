@@ -0,0 +1,103 @@
+# -*- encoding: utf-8 -*-
+# Date: 18/Oct/2026
+# Author: Steven Huang, Auckland, NZ
+# License: MIT License
+"""
+Description: Content-addressed on-disk cache of numpy arrays, entries are .npz files
+named by the hash of their key parameters, the least recently used entries are evicted
+when the cache size exceeds max_size
+"""
+import os
+import hashlib
+import numpy as np
+
+__all__ = ['DiskCache']
+
+
+class DiskCache():
+    """ size-bounded LRU cache of numpy arrays on disk """
+
+    def __init__(self, path, max_size=1024, prefix='cache', compress=False):
+        self.path = path  # cache folder
+        self.max_size = max_size * 1024 * 1024  # maximum total size, MB
+        self.prefix = prefix  # entry file name prefix
+        self.compress = compress  # smaller entries, slower to save and load
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def key(**params):
+        """ content address of the parameters, arrays are hashed by their bytes """
+        h = hashlib.sha1()
+        for name in sorted(params):
+            value = params[name]
+            if isinstance(value, np.ndarray):
+                value = (value.dtype.str, value.shape, hashlib.sha1(np.ascontiguousarray(value).tobytes()).hexdigest())
+            h.update(f'{name}={value!r};'.encode())
+        return h.hexdigest()
+
+    def file(self, key):
+        return os.path.join(self.path, f'{self.prefix}_{key}.npz')
+
+    def load(self, key):
+        """ arrays dict of the key, None when it's not cached """
+        file = self.file(key)
+        try:
+            with np.load(file) as data:
+                arrays = {name: data[name] for name in data.files}
+        except (OSError, ValueError):
+            return None
+        os.utime(file)  # mark as recently used
+        return arrays
+
+    def save(self, key, **arrays):
+        """ cache arrays under the key, the entry is renamed into place when it's completely written,
+        entries larger than max_size are not cached, None is returned """
+        file = self.file(key)
+        tmp_file = f'{file}.{os.getpid()}.tmp.npz'
+        if self.compress:
+            np.savez_compressed(tmp_file, **arrays)
+        else:
+            np.savez(tmp_file, **arrays)
+        size = os.path.getsize(tmp_file)
+        if size > self.max_size:
+            os.remove(tmp_file)
+            print(f'Warning, cache entry of {size} bytes exceeds the cache size {self.max_size}, not cached: {key}')
+            return None
+        os.replace(tmp_file, file)
+        self.evict(keep=file)
+        return file
+
+    def entries(self):
+        """ cached files, least recently used first """
+        files = [os.path.join(self.path, f) for f in os.listdir(self.path)
+                 if f.startswith(self.prefix + '_') and f.endswith('.npz') and not f.endswith('.tmp.npz')]
+        stats = []
+        for f in files:
+            try:
+                st = os.stat(f)
+            except OSError:  # evicted by another process
+                continue
+            stats.append((st.st_mtime, st.st_size, f))
+        return sorted(stats)
+
+    def size(self):
+        return sum(s for _, s, _ in self.entries())
+
+    def evict(self, keep=None):
+        """ remove the least recently used entries until the cache fits in max_size, except the keep file """
+        entries = self.entries()
+        total = sum(s for _, s, _ in entries)
+        for _, s, f in entries:
+            if total <= self.max_size:
+                break
+            if f == keep:
+                continue
+            try:
+                os.remove(f)
+            except OSError:
+                pass
+            total -= s
+
+    def clear(self):
+        for _, _, f in self.entries():
+            os.remove(f)
@@ -3,17 +3,167 @@
 # Author: Steven Huang, Auckland, NZ
 # License: MIT License
 """
-Description: SVGFileV2, SVGFile class
+Description: SVGFileV2, SVGStreamWriter, SVGFile class
 """
 
 import os
+import re
+import copy
+import hashlib
+from collections import namedtuple
+from contextlib import contextmanager, ExitStack
+from xml.sax.saxutils import quoteattr, escape
+import numpy as np
 from lxml import etree
-from svg.basic import draw_tag, style_content, get_styles, add_style
+from svg.basic import draw_tag, draw_any, style_content, get_styles
+
+__all__ = ['SVGFileV2', 'SVGStreamWriter', 'SVGFile', 'bulk_fragments',
+           'line_columns', 'circle_columns', 'rect_columns']
+
+
+STYLE_ATTRIBUTES = ('fill', 'fill-opacity', 'fill-rule', 'stroke', 'stroke-width', 'stroke-dasharray',
+                    'stroke-opacity', 'stroke-linecap', 'stroke-linejoin', 'opacity')  # hoisted by optimize_styles
+INHERITED_ATTRIBUTES = STYLE_ATTRIBUTES[:-1]  # opacity is not inherited by the children of a group
+ATTRIBUTE_ENTITIES = {'"': '&quot;', '\n': '&#10;', '\r': '&#13;', '\t': '&#9;'}  # as quoteattr, with & < >
+StyleReport = namedtuple('StyleReport', 'classes groups elements bytes_saved')
+UNINSTANCED_TAGS = ('defs', 'symbol', 'use', 'linearGradient', 'radialGradient', 'pattern',
+                    'clipPath', 'mask', 'marker', 'filter')  # kept by instance_subtrees
+InstanceReport = namedtuple('InstanceReport', 'symbols uses bytes_saved')
+
+
+def _attribute_size(key, value):
+    """ serialized bytes of an attribute """
+    return len(key) + len(escape(value, {'"': '&quot;'})) + 4
+
+
+def _style_properties(css):
+    """ properties declared by css rules, (properties of other selectors, class -> properties) """
+    others, classes = set(), {}
+    for selector, body in re.findall(r'([^{}]+)\{([^{}]*)\}', css):
+        properties = set(re.findall(r'([\w-]+)\s*:', body))
+        for sel in selector.split(','):
+            match = re.fullmatch(r'\s*\.([\w-]+)\s*', sel)
+            if match:
+                classes.setdefault(match.group(1), set()).update(properties)
+            else:
+                others.update(properties)
+    return others, classes
+
+
+def _subtree_keys(node):
+    """ comparable keys of node and its descendants, the id and transform of the key's own root excluded,
+    the transforms inside are kept, None for subtrees with ids inside
+    """
+    keys, has_id = {}, {}
+    for e in reversed(list(node.iter())):  # children before their parents
+        has_id[e] = isinstance(e.tag, str) and e.get('id') is not None
+        if not isinstance(e.tag, str):
+            keys[e] = (None, e.text)  # comments
+        elif any(keys[c] is None or has_id[c] for c in e):
+            keys[e] = None
+        else:
+            attris = tuple(sorted((k, v) for k, v in e.attrib.items() if k not in ('id', 'transform')))
+            keys[e] = (etree.QName(e).localname, attris, e.text,
+                       tuple((keys[c], c.get('transform') if isinstance(c.tag, str) else None, c.tail) for c in e))
+    return keys
+
+
+def _serialize(node, with_tail=False):
+    """ serialized node as in the document, without the namespace declarations of a detached node """
+    return re.sub(rb' xmlns(:\w+)?="[^"]*"', b'', etree.tostring(node, with_tail=with_tail))
+
+
+def _node_size(node):
+    """ serialized bytes of a node in the document, without its tail """
+    return len(_serialize(node))
+
+
+def _symbol_body(node):
+    """ serialized definition without its own id, to compare definitions """
+    attris = sorted((k, v) for k, v in node.attrib.items() if k != 'id')
+    return repr(attris).encode() + (node.text or '').encode() + b''.join(_serialize(c, with_tail=True) for c in node)
+
+
+def _referenced_ids(root):
+    """ ids referenced by url(#id) in attributes and style sheets, or by href """
+    ids = set()
+    for e in root.iter():
+        if not isinstance(e.tag, str):
+            continue
+        values = list(e.attrib.values()) + ([e.text] if etree.QName(e).localname == 'style' and e.text else [])
+        for value in values:
+            ids.update(re.findall(r'url\(\s*[\'"]?#([^\s\'")]+)', value))
+        for key, value in e.attrib.items():
+            if etree.QName(key).localname == 'href' and value.startswith('#'):
+                ids.add(value[1:])
+    return ids
+
+
+def _unique_id(prefix, ids):
+    """ new id not in ids """
+    n = 1
+    while f'{prefix}{n}' in ids:
+        n += 1
+    return f'{prefix}{n}'
+
+
+def _escaped_column(value):
+    """ attribute column of xml escaped strings """
+    strings = value.astype(str).tolist()
+    joined = ''.join(strings)
+    if any(c in joined for c in '&<>"\n\r\t'):
+        strings = [escape(v, ATTRIBUTE_ENTITIES) for v in strings]
+    return np.array(strings, dtype=object)
+
+
+def bulk_fragments(tag, columns: dict, decimals=1, chunk=100000, **kwargs):
+    """ xml fragments of many nodes of the same tag, chunk nodes per fragment, see SVGFileV2.add_bulk """
+    columns = dict(columns)
+    columns.update((key, value) for key, value in kwargs.items() if value is not None)
+    attris = []  # attributes in the argument order
+    values = []
+    for key, value in columns.items():
+        key = key.replace('_', '-')
+        if isinstance(value, (list, np.ndarray)):
+            value = np.asarray(value)
+            if value.dtype.kind not in 'fiu':
+                value = _escaped_column(value)
+            values.append(value)
+            attris.append(f' {key}="' + {'f': f'%.{decimals}f', 'i': '%d', 'u': '%d'}.get(value.dtype.kind, '%s') + '"')
+        else:
+            attris.append(f' {key}={quoteattr(str(value))}'.replace('%', '%%'))
+    num = len(values[0]) if values else 0
+    if num == 0:
+        return
+
+    table = np.empty((num, len(values)), dtype=object)
+    for i, value in enumerate(values):
+        table[:, i] = value.tolist()
+    template = f'<{tag}{"".join(attris)}/>'
+    for i in range(0, num, chunk):
+        rows = table[i:i + chunk]
+        yield (template * rows.shape[0]) % tuple(rows.ravel().tolist())
+
+
+def line_columns(lines):
+    """ line attribute columns of N*4 array, each row is (x1, y1, x2, y2) """
+    lines = np.asarray(lines).reshape((-1, 4))
+    return {'x1': lines[:, 0], 'y1': lines[:, 1], 'x2': lines[:, 2], 'y2': lines[:, 3]}
+
+
+def circle_columns(pts):
+    """ circle attribute columns of N*2 array of centers """
+    pts = np.asarray(pts).reshape((-1, 2))
+    return {'cx': pts[:, 0], 'cy': pts[:, 1]}
 
-__all__ = ['SVGFileV2', 'SVGFile']
 
+def rect_columns(rects):
+    """ rect attribute columns of N*4 array, each row is (x, y, width, height) """
+    rects = np.asarray(rects).reshape((-1, 4))
+    return {'x': rects[:, 0], 'y': rects[:, 1], 'width': rects[:, 2], 'height': rects[:, 3]}
 
-class SVGFileV2:
+
+class SVGFileV2:  # pylint: disable=too-many-public-methods
     """ lxml version svg """
 
     _url = 'http://www.w3.org/2000/svg'
@@ -24,10 +174,18 @@ class SVGFileV2:
     _UNIX_LINE_ENDING = '\n'
 
     def __init__(self, file, W=100, H=100, title=None, border=False,
-                 border_color='black', border_width=1):
+                 border_color='black', border_width=1, optimize=False):
         self._file = file
+        self._optimize = optimize  # run instance_subtrees and optimize_styles at close
+        self.style_report = None
+        self.instance_report = None
+        self._symbols = {}  # symbol name -> id of its definition
+        self._symbol_keys = {}  # subtree key -> (id, serialized body), identical definitions are shared
         self._width = W
         self._height = H
+        self._style_rules = {}  # style registry, rule key -> css text, serialized in one <style> at close
+        self._style_classes = {}  # class name -> declarations key
+        self._styles_written = 0
 
         self._root = etree.Element("svg", nsmap={
                                    None: SVGFileV2._url, "xlink": SVGFileV2._xlink},
@@ -50,15 +208,30 @@ class SVGFileV2:
         """ get height, width """
         return self._height, self._width
 
+    @staticmethod
+    def _declarations(style_dict: dict):
+        """ order independent key of style declarations """
+        return tuple(sorted((key, str(value)) for key, value in style_dict.items()))
+
     def add_svg_style(self, tag: str, style_dict: dict):
-        """ add svg style """
-        style_node = self.get_child(child_tag='style')
-        if style_node is not None:
-            new_style = style_content(tag, get_styles(style_dict))
-            if new_style not in style_node.text:
-                style_node.text += new_style
-        else:
-            self.draw(add_style(tag, get_styles(style_dict)))
+        """ add svg style rule of a selector, identical rules are added once """
+        key = (tag, SVGFileV2._declarations(style_dict))
+        if key not in self._style_rules:
+            self._style_rules[key] = style_content(tag, get_styles(style_dict))
+
+    def style_class(self, style_dict: dict, prefix='s'):
+        """ css class of style declarations, the name is a stable hash of the declarations
+        Usage examples:
+        svg.add_lines(lines, cls=svg.style_class({'stroke': 'red', 'stroke-width': 0.5}))
+        """
+        declarations = SVGFileV2._declarations(style_dict)
+        digest = hashlib.sha1(repr(declarations).encode()).hexdigest()
+        for n in range(6, len(digest) + 1, 2):
+            name = prefix + digest[:n]
+            if self._style_classes.setdefault(name, declarations) == declarations:
+                break
+        self.add_svg_style('.' + name, style_dict)
+        return name
 
     def add_root_style(self, new_style: str):
         """ add root svg node style """
@@ -79,13 +252,112 @@ class SVGFileV2:
         self.add_root_style(f'background-color:{color}')
 
     def add_style_node(self, style: str):
+        """ add css text to the style registry, identical texts are added once """
+        self._style_rules.setdefault(('', style), style)
+
+    def _write_styles(self):
+        """ serialize the new rules of the style registry into the first <style> node """
+        rules = list(self._style_rules.values())[self._styles_written:]
+        if not rules:
+            return
+        self._styles_written = len(self._style_rules)
         style_node = self.get_child(child_tag='style')
         if style_node is None:
-            style_node = self.draw(draw_tag('style'))
-
-        if style_node.text is None:
-            style_node.text = ''
-        style_node.text += style
+            style_node = self._new_node(draw_tag('style'))
+            self._add_style_node(style_node)
+        style_node.text = (style_node.text or '') + ''.join(rules)
+
+    def _add_style_node(self, style_node):
+        """ link the registry <style> node before the drawn nodes, after the title """
+        self._root.insert(1 if len(self._root) and self._root[0].tag == 'title' else 0, style_node)
+
+    def _elements(self):
+        """ drawn elements, no root, comments or style sheets """
+        return [e for e in self._root.iterdescendants() if isinstance(e.tag, str)
+                and etree.QName(e).localname not in ('style', 'title', 'desc', 'script', 'metadata')]
+
+    def optimize_styles(self, min_count=2, groups=True):
+        """ hoist recurring presentation attributes into the parent <g> when all its children share them,
+        and recurring attribute bundles into css classes of the style registry. Css rules override presentation
+        attributes, so the properties a rule of the element (other than its own classes) may declare are kept
+
+        Args:
+            min_count (int, optional): elements sharing a bundle to make a class. Defaults to 2.
+            groups (bool, optional): hoist into the parent groups first. Defaults to True.
+
+        Returns:
+            StyleReport: (classes, groups, elements, bytes_saved), bytes_saved is of the serialized file
+        """
+        css = ''.join(n.text or '' for n in self._root.iter('{*}style')) + ''.join(self._style_rules.values())
+        others, class_properties = _style_properties(css)
+
+        def blocked(e):
+            return others.union(*(class_properties.get(c, ()) for c in (e.get('class') or '').split()))
+
+        elements = self._elements()
+        group_count, group_saved = self._hoist_to_groups(elements, blocked) if groups else (0, 0)
+        class_count, element_count, class_saved = self._hoist_to_classes(elements, blocked, min_count)
+        return StyleReport(class_count, group_count, element_count, group_saved + class_saved)
+
+    @staticmethod
+    def _hoist_to_groups(elements, blocked):
+        """ move the inherited attributes shared by all the children of a group to the group """
+        count, saved = 0, 0
+        for g in reversed(elements):  # inner groups first
+            children = [c for c in g if isinstance(c.tag, str)]
+            if etree.QName(g).localname != 'g' or len(children) < 2:
+                continue
+            for key in INHERITED_ATTRIBUTES:
+                values = {c.get(key) for c in children}
+                if len(values) != 1 or None in values or any(key in blocked(c) for c in children + [g]):
+                    continue
+                value = values.pop()
+                saved += _attribute_size(key, value) * (len(children) - 1)
+                if key in g.attrib:
+                    saved += _attribute_size(key, g.get(key))
+                g.set(key, value)
+                for c in children:
+                    del c.attrib[key]
+                count += 1
+        return count, saved
+
+    def _hoist_to_classes(self, elements, blocked, min_count):
+        """ replace the attribute bundles shared by min_count elements with a class, when it's smaller,
+        a bundle is the attributes of an element whose values recur in min_count elements, the others stay inline
+        """
+        candidates = []
+        pair_counts = {}
+        for e in elements:
+            keep = blocked(e)
+            pairs = tuple((key, e.get(key)) for key in STYLE_ATTRIBUTES if key in e.attrib and key not in keep)
+            candidates.append((e, pairs))
+            for pair in pairs:
+                pair_counts[pair] = pair_counts.get(pair, 0) + 1
+
+        bundles = {}
+        for e, pairs in candidates:
+            bundle = tuple(pair for pair in pairs if pair_counts[pair] >= min_count)
+            if bundle:
+                bundles.setdefault(bundle, []).append(e)
+
+        count, element_count, saved = 0, 0, 0
+        for bundle, nodes in bundles.items():
+            if len(nodes) < min_count:
+                continue
+            size = sum(_attribute_size(key, value) for key, value in bundle) * len(nodes)
+            size -= sum(7 + (1 if e.get('class') else 9) for e in nodes)  # ' class="s123456"' or ' s123456'
+            size -= len(style_content('.s123456', get_styles(dict(bundle))))
+            if size <= 0:
+                continue
+            name = self.style_class(dict(bundle))
+            for e in nodes:
+                for key, _ in bundle:
+                    del e.attrib[key]
+                e.set('class', f'{e.get("class")} {name}' if e.get('class') else name)
+            saved += size - (len(name) - 7) * (len(nodes) + 1)  # longer names of hash collisions
+            count += 1
+            element_count += len(nodes)
+        return count, element_count, saved
 
     def set_title(self, title=None):
         """ set svg title """
@@ -131,6 +403,204 @@ class SVGFileV2:
         self._add_child(node_parent, child_node)
         return child_node
 
+    def _sub_node(self, parent, tag, attri_dict):
+        """ create a child node from attributes and link it to parent node """
+        if parent is None:
+            parent = self._root
+        return etree.SubElement(parent, tag, attri_dict)
+
+    def add(self, tag, node=None, text=None, **kwargs):
+        """ create a child node directly from attributes, no xml string parsing
+        Usage examples:
+        svg.add('circle', cx=10, cy=10, r=2, fill='red') or
+        svg.add(tagName, node, text, **attrDict)
+        Underscores in attribute names are converted to hyphens, stroke_width -> stroke-width
+        """
+        child_node = self._sub_node(node, tag, {key.replace('_', '-'): str(value) for key, value in kwargs.items()})
+        if text is not None:
+            child_node.text = str(text)
+        return child_node
+
+    def add_line(self, x1, y1, x2, y2, node=None, **kwargs):
+        """ add a line node """
+        attri_dict = {'x1': str(x1), 'y1': str(y1), 'x2': str(x2), 'y2': str(y2)}
+        if kwargs:
+            attri_dict.update({key.replace('_', '-'): str(value) for key, value in kwargs.items()})
+        return self._sub_node(node, 'line', attri_dict)
+
+    def add_rect(self, x, y, width, height, node=None, **kwargs):
+        """ add a rectangle node """
+        attri_dict = {'x': str(x), 'y': str(y), 'width': str(width), 'height': str(height)}
+        if kwargs:
+            attri_dict.update({key.replace('_', '-'): str(value) for key, value in kwargs.items()})
+        return self._sub_node(node, 'rect', attri_dict)
+
+    def add_circle(self, cx, cy, r, node=None, **kwargs):
+        """ add a circle node """
+        attri_dict = {'cx': str(cx), 'cy': str(cy), 'r': str(r)}
+        if kwargs:
+            attri_dict.update({key.replace('_', '-'): str(value) for key, value in kwargs.items()})
+        return self._sub_node(node, 'circle', attri_dict)
+
+    def _add_fragment(self, parent, fragment: str):
+        """ parse xml fragment of sibling nodes once and link them to parent node """
+        if parent is None:
+            parent = self._root
+        parent.extend(etree.fromstring(f'<g>{fragment}</g>'))
+
+    def add_bulk(self, tag, columns: dict, node=None, decimals=1, chunk=100000, **kwargs):
+        """ add many nodes of the same tag in one operation
+        columns: attribute name -> N values, one node per row, floats are formatted with decimals
+        kwargs: attributes shared by all the nodes, list or array values are per node columns
+        Usage examples:
+        svg.add_bulk('circle', {'cx': x, 'cy': y}, r=2, fill=colors)
+        """
+        self.add_fragments(bulk_fragments(tag, columns, decimals, chunk, **kwargs), node)
+
+    def add_fragments(self, fragments, node=None):
+        """ add xml fragments of sibling nodes in order, e.g. made by bulk_fragments in other processes """
+        for fragment in fragments:
+            self._add_fragment(node, fragment)
+
+    def add_lines(self, lines, node=None, cls=None, decimals=1, **kwargs):
+        """ add lines from N*4 array, each row is (x1, y1, x2, y2) """
+        self.add_bulk('line', line_columns(lines), node, decimals, **{'class': cls}, **kwargs)
+
+    def add_circles(self, pts, r=None, node=None, cls=None, decimals=1, **kwargs):
+        """ add circles from N*2 array of centers, r is a number or N radii """
+        self.add_bulk('circle', circle_columns(pts), node, decimals, **{'class': cls}, r=r, **kwargs)
+
+    def add_rects(self, rects, node=None, cls=None, decimals=1, **kwargs):
+        """ add rectangles from N*4 array, each row is (x, y, width, height) """
+        self.add_bulk('rect', rect_columns(rects), node, decimals, **{'class': cls}, **kwargs)
+
+    def get_defs(self):
+        """ get the <defs> node, created on first use """
+        defs = self.get_child(child_tag='defs')
+        return defs if defs is not None else self.draw(draw_tag('defs'))
+
+    def define_symbol(self, name, builder):
+        """ define a reusable shape once, builder(svg, node) draws it into a <g> of <defs>,
+        a definition identical to an earlier one is dropped and the name refers to the earlier one,
+        definitions with ids inside are never shared
+        Usage examples:
+        svg.define_symbol('smile', partial(drawSmileSVGNode, radius=10))
+        svg.use('smile', x, y)
+
+        Returns:
+            str: id of the definition, for <use> href
+        """
+        if name in self._symbols:
+            return self._symbols[name]
+        node = self.draw_node(self.get_defs(), draw_any('g', id=name))
+        builder(self, node)
+        key = _subtree_keys(node)[node]
+        body = _symbol_body(node)
+        earlier = self._symbol_keys.get(key) if key is not None else None
+        if earlier is not None and earlier[1] == body:
+            node.getparent().remove(node)
+            symbol_id = earlier[0]
+        else:
+            symbol_id = name
+            if key is not None:
+                self._symbol_keys.setdefault(key, (name, body))
+        self._symbols[name] = symbol_id
+        return symbol_id
+
+    def use(self, name, x=0, y=0, transform=None, node=None, **kwargs):
+        """ add a <use> node of a symbol defined by define_symbol """
+        attri_dict = {f'{{{self._xlink}}}href': f'#{self._symbols.get(name, name)}'}
+        if x:
+            attri_dict['x'] = str(x)
+        if y:
+            attri_dict['y'] = str(y)
+        if transform is not None:
+            attri_dict['transform'] = str(transform)
+        attri_dict.update({key.replace('_', '-'): str(value) for key, value in kwargs.items()})
+        return self._sub_node(node, 'use', attri_dict)
+
+    def _instance_candidates(self):
+        """ drawn elements that may be replaced by <use>, not in definitions, not referenced """
+        refs = _referenced_ids(self._root)
+        return [e for e in self._elements() if etree.QName(e).localname not in UNINSTANCED_TAGS
+                and e.get('id') not in refs
+                and not any(etree.QName(a).localname in UNINSTANCED_TAGS for a in e.iterancestors())]
+
+    def instance_subtrees(self, min_count=2, min_size=64):
+        """ replace identical subtrees drawn min_count times with <use> nodes of one definition in <defs>,
+        subtrees are compared without their own id and transform, which move to the <use> node.
+        Subtrees with ids inside, referenced elements, paint servers, clip paths, masks, markers and filters
+        are kept, and a subtree is only instanced when the definition and the <use> nodes are smaller
+
+        Args:
+            min_count (int, optional): occurrences of a subtree to instance it. Defaults to 2.
+            min_size (int, optional): minimum serialized bytes of an instanced subtree. Defaults to 64.
+
+        Returns:
+            InstanceReport: (symbols, uses, bytes_saved), bytes_saved is without indentation
+        """
+        elements = self._instance_candidates()
+        keys = {}
+        for e in elements:
+            if e.getparent() is self._root:
+                keys.update(_subtree_keys(e))
+        occurrences = {}
+        for e in elements:
+            if keys.get(e) is not None:
+                occurrences.setdefault(keys[e], []).append(e)
+
+        ids = {e.get('id') for e in self._root.iter() if isinstance(e.tag, str) and e.get('id')}
+        defs = self.get_child(child_tag='defs')
+        if defs is None:
+            defs_cost = len('<defs></defs>')
+        else:  # <defs/> becomes <defs>...</defs>
+            defs_cost = 0 if len(defs) or defs.text else len('<defs></defs>') - len('<defs/>')
+        symbols, uses, saved = 0, 0, 0
+        replaced = set()
+        for key, nodes in occurrences.items():  # outer subtrees first, in document order
+            nodes = [e for e in nodes if not any(a in replaced for a in e.iterancestors())]
+            if len(nodes) < min_count or _node_size(nodes[0]) < min_size:
+                continue
+            symbol_id, symbol = self._instance_symbol(key, nodes[0], ids)
+            use_nodes = [self._use_node(symbol_id, e) for e in nodes]
+            gain = sum(_node_size(e) - _node_size(u) for e, u in zip(nodes, use_nodes))
+            gain -= 0 if symbol is None else _node_size(symbol) + defs_cost
+            if gain <= 0:
+                continue
+            if symbol is not None:
+                ids.add(symbol_id)
+                self._symbol_keys.setdefault(key, (symbol_id, _symbol_body(symbol)))
+                self.get_defs().append(symbol)
+                defs_cost = 0
+            for e, u in zip(nodes, use_nodes):
+                u.tail = e.tail
+                e.getparent().replace(e, u)
+                replaced.add(e)
+            symbols += 1
+            uses += len(nodes)
+            saved += gain
+        return InstanceReport(symbols, uses, saved)
+
+    def _instance_symbol(self, key, e, ids):
+        """ definition of subtree e, (id, new definition node or None when an identical one exists) """
+        symbol = copy.deepcopy(e)
+        symbol.tail = None
+        for attri in ('id', 'transform'):
+            symbol.attrib.pop(attri, None)
+        earlier = self._symbol_keys.get(key)
+        if earlier is not None and earlier[1] == _symbol_body(symbol):
+            return earlier[0], None
+        symbol.set('id', _unique_id('instance', ids))
+        return symbol.get('id'), symbol
+
+    def _use_node(self, symbol_id, e):
+        """ <use> node of a symbol replacing element e, with its id and transform """
+        use = etree.Element('use', {f'{{{self._xlink}}}href': f'#{symbol_id}'}, nsmap={'xlink': self._xlink})
+        for attri in ('id', 'transform'):
+            if e.get(attri) is not None:
+                use.set(attri, e.get(attri))
+        return use
+
     def get_child(self, node=None, child_tag=None):
         """ get first child node by tag """
         if node is None:
@@ -144,6 +614,10 @@ class SVGFileV2:
 
     def close(self, win_eof=True):
         """ write lxml tree to file """
+        if self._optimize:
+            self.instance_report = self.instance_subtrees()
+            self.style_report = self.optimize_styles()
+        self._write_styles()
         tree = etree.ElementTree(self._root)
         if not win_eof:
             tree.write(self._file, pretty_print=True,
@@ -162,6 +636,207 @@ class SVGFileV2:
         self.close()
 
 
+class _EolFile:
+    """ binary file wrapper converting line endings while streaming """
+
+    def __init__(self, file, newline=b'\n'):
+        self._fh = open(file, 'wb')  # pylint: disable=consider-using-with
+        self._newline = newline
+
+    def write(self, data):
+        if self._newline != b'\n':
+            data = data.replace(b'\n', self._newline)
+        self._fh.write(data)
+
+    def close(self):
+        self._fh.close()
+
+
+class SVGStreamWriter(SVGFileV2):
+    """ streaming version of SVGFileV2, elements are written to file incrementally
+
+    Every drawn element is kept in memory only until its next sibling is drawn,
+    so memory is bounded by the largest single subtree, not the element count.
+    The style registry rules added before the first drawn node are written after the title,
+    as SVGFileV2 places them; later rules, drawn <style> and <defs> are retained and
+    written before </svg> at close time.
+    Group nodes whose children are drawn later must be opened by group():
+
+        with svg.group(draw_any('g')) as g:
+            svg.draw_node(g, draw_only_line(x1, y1, x2, y2))
+    """
+
+    _RETAINED_TAGS = ('style', 'defs')
+
+    def __init__(self, file, W=100, H=100, title=None, border=False,
+                 border_color='black', border_width=1, win_eof=True):
+        self._eof = SVGFileV2._WINDOWS_LINE_ENDING if win_eof else SVGFileV2._UNIX_LINE_ENDING
+        self._writer = ExitStack()
+        self._fh = None
+        self._xf = None
+        self._groups = []  # opened group nodes, innermost last
+        self._pending = [None]  # last drawn (not yet written) node of each open level
+        self._retained = []  # style and defs nodes, written at close
+        self._closed = False
+        self._header_styles = False  # registry rules written before the first drawn node
+        super().__init__(file, W=W, H=H, title=title, border=border,
+                         border_color=border_color, border_width=border_width)
+
+    def _start(self):
+        """ write xml declaration and <svg> start tag """
+        if self._xf is not None:
+            return
+        self._fh = _EolFile(self._file, self._eof.encode(r'UTF-8'))
+        self._writer.callback(self._fh.close)
+        self._writer.callback(self._fh.write, b'\n')  # after </svg>, as SVGFileV2 pretty printing
+        self._xf = self._writer.enter_context(etree.xmlfile(self._fh, encoding=r'UTF-8'))
+        self._xf.write_declaration(standalone=False)
+        self._writer.enter_context(self._xf.element(self._root.tag, dict(self._root.attrib),
+                                                    nsmap=self._root.nsmap))
+
+    def _write_header_styles(self):
+        """ write the style registry rules added so far before the first drawn node """
+        if self._header_styles:
+            return
+        self._header_styles = True
+        if not self._style_rules:
+            return
+        self._write_styles()
+        style_node = self.get_child(child_tag='style')
+        if any(style_node is i for i in self._retained):
+            self._retained.remove(style_node)
+            self._write(style_node)
+
+    def _write(self, node):
+        """ write a finished node to file """
+        self._start()
+        if len(self._pending) == 1 and node.tag not in ('title',) + SVGStreamWriter._RETAINED_TAGS:
+            self._write_header_styles()
+        self._xf.write(SVGFileV2._UNIX_LINE_ENDING + '  ' * len(self._pending))
+        self._xf.write(node, pretty_print=False)
+
+    def _flush_pending(self):
+        """ write pending node of the innermost open level """
+        node = self._pending[-1]
+        if node is not None:
+            self._write(node)
+            self._pending[-1] = None
+
+    def _is_buffered(self, node):
+        """ whether node still lives in memory (pending, retained or their descendant) """
+        top = node
+        while top.getparent() is not None:
+            top = top.getparent()
+        return any(top is i for i in self._pending + self._retained)
+
+    def _add_child(self, parent, child):
+        """ add child node, buffer it as pending node of the level """
+        if parent is None:
+            parent = self._root
+        level_node = self._groups[-1] if self._groups else self._root
+        if parent is level_node:
+            if parent is self._root and child.tag in SVGStreamWriter._RETAINED_TAGS:
+                self._retained.append(child)
+                return
+            self._flush_pending()
+            self._pending[-1] = child
+        elif parent is not self._root and self._is_buffered(parent):
+            parent.append(child)
+        else:
+            raise ValueError(f'Node <{parent.tag}> is already written, open it with group() to draw into it')
+
+    def _add_style_node(self, style_node):
+        """ retain the registry <style> node, it's written at close """
+        self._add_child(self._root, style_node)
+
+    def optimize_styles(self, min_count=2, groups=True):
+        """ streamed nodes are already written, see SVGFileV2.optimize_styles """
+        raise ValueError('Nodes of SVGStreamWriter are written while drawing, optimize_styles needs SVGFileV2')
+
+    def instance_subtrees(self, min_count=2, min_size=64):
+        """ streamed nodes are already written, see SVGFileV2.instance_subtrees """
+        raise ValueError('Nodes of SVGStreamWriter are written while drawing, instance_subtrees needs SVGFileV2')
+
+    def _sub_node(self, parent, tag, attri_dict):
+        """ create a child node from attributes, buffer it as pending node of the level """
+        child_node = etree.Element(tag, attri_dict)
+        self._add_child(parent, child_node)
+        return child_node
+
+    def _add_fragment(self, parent, fragment: str):
+        """ write xml fragment of sibling nodes to file directly, or link them to a buffered node """
+        if parent is None:
+            parent = self._root
+        level_node = self._groups[-1] if self._groups else self._root
+        if parent is not level_node:
+            if parent is self._root or not self._is_buffered(parent):
+                raise ValueError(f'Node <{parent.tag}> is already written, open it with group() to draw into it')
+            super()._add_fragment(parent, fragment)
+            return
+
+        self._flush_pending()
+        self._start()
+        if len(self._pending) == 1:
+            self._write_header_styles()
+        self._xf.flush()
+        sep = SVGFileV2._UNIX_LINE_ENDING + '  ' * len(self._pending)
+        self._fh.write((sep + fragment.replace('/><', '/>' + sep + '<')).encode(r'UTF-8'))
+
+    def get_child(self, node=None, child_tag=None):
+        """ get first child node by tag """
+        if node is None or node is self._root:
+            for i in self._retained + self._pending[:1]:
+                if i is not None and i.tag == child_tag:
+                    return i
+            return None
+        return super().get_child(node, child_tag)
+
+    @contextmanager
+    def group(self, content: str = '', node=None):
+        """ open a group node, children drawn inside the context are streamed """
+        level_node = self._groups[-1] if self._groups else self._root
+        if node is not None and node is not level_node:
+            raise ValueError('Group can only be opened under the innermost opened group')
+        group_node = self._new_node(content)
+        self._add_child(level_node, group_node)
+        self._pending[-1] = None
+        self._start()
+        if len(self._pending) == 1:
+            self._write_header_styles()
+        self._xf.write(SVGFileV2._UNIX_LINE_ENDING + '  ' * len(self._pending))
+        with self._xf.element(group_node.tag, dict(group_node.attrib)):
+            if group_node.text:
+                self._xf.write(group_node.text)
+            self._groups.append(group_node)
+            self._pending.append(None)
+            try:
+                yield group_node
+            finally:
+                self._flush_pending()
+                self._pending.pop()
+                self._groups.pop()
+                self._xf.write(SVGFileV2._UNIX_LINE_ENDING + '  ' * len(self._pending))
+
+    def close(self, win_eof=True):
+        """ write remaining nodes and finish the file """
+        if self._closed:
+            return
+        self._closed = True
+        self._write_styles()
+        self._flush_pending()
+        for node in self._retained:
+            self._write(node)
+        self._start()
+        self._xf.write(SVGFileV2._UNIX_LINE_ENDING)
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
 class SVGFile:
     """ string IO version, deprecated """
 
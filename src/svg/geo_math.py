@@ -6,6 +6,7 @@
 Description: math functions
 """
 import numpy as np
+from scipy import sparse
 from scipy.spatial import distance
 
 
@@ -159,6 +160,46 @@ def distance_pt_line(pt, p1, p2):
     return np.linalg.norm(np.cross(p2 - p1, p1 - pt)) / np.linalg.norm(p2 - p1)
 
 
+def distance_pts_lines(pts, lines, max_memory=256, max_distance=None):
+    """ calculate the distances of points to lines, vectorized
+
+    Args:
+        pts (np.array): shape (P, 2) points
+        lines (np.array): shape (L, 4) lines, each row is (x1, y1, x2, y2)
+        max_memory (int, optional): memory cap in MB of temporary arrays, lines are
+            processed in blocks under the cap. Defaults to 256.
+        max_distance (float, optional): when given, return a scipy CSR matrix that only
+            stores distances <= max_distance (zeros are stored explicitly). Defaults to None.
+
+    Returns:
+        np.array or csr_matrix: shape (L, P) distances
+    """
+    pts = np.asarray(pts, dtype=np.float64).reshape((-1, 2))
+    lines = np.asarray(lines, dtype=np.float64).reshape((-1, 4))
+    block = max(1, int(max_memory * 2**20 // (4 * 8 * pts.shape[0])))  # about 4 temporary (block, P) arrays
+
+    dense = None if max_distance is not None else np.empty((lines.shape[0], pts.shape[0]))
+    rows, cols, data = [], [], []
+    for start in range(0, lines.shape[0], block):
+        part = lines[start:start + block]
+        vx = (part[:, 2] - part[:, 0])[:, None]
+        vy = (part[:, 3] - part[:, 1])[:, None]
+        cross = vx * (part[:, 1:2] - pts[:, 1]) - vy * (part[:, 0:1] - pts[:, 0])
+        dis = np.abs(cross) / np.hypot(vx, vy)
+        if dense is not None:
+            dense[start:start + part.shape[0]] = dis
+        else:
+            r, c = np.nonzero(dis <= max_distance)
+            rows.append(r + start)
+            cols.append(c)
+            data.append(dis[r, c])
+
+    if dense is not None:
+        return dense
+    return sparse.csr_matrix((np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))),
+                             shape=(lines.shape[0], pts.shape[0]))
+
+
 def main():
     """ main function """
     x = [1, 2]
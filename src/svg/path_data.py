@@ -0,0 +1,144 @@
+# -*- encoding: utf-8 -*-
+# Date: 18/Oct/2026
+# Author: Steven Huang, Auckland, NZ
+# License: MIT License
+"""
+Description: Compact svg path data encoder, relative commands, implicit repeated
+command letters, minimal separators and the fewest decimals within an error threshold
+"""
+import numpy as np
+
+__all__ = ['path_precision', 'path_data', 'polyline_data']
+
+MAX_PRECISION = 6
+MOVE, LINE, CURVE, CURVE_POINT = range(4)  # point commands 'M', 'L', 'C', 'c'
+COMMANDS = 'MLCc'
+LETTERS = ('', 'M', 'm', 'l', 'h', 'v', 'c', 'z')  # written command letters
+NONE, ABS_MOVE, REL_MOVE, REL_LINE, REL_H, REL_V, REL_CURVE, CLOSE = range(len(LETTERS))
+
+
+def path_precision(values, max_error=0.05, max_precision=MAX_PRECISION):
+    """ fewest decimals that round all the values within max_error """
+    values = np.asarray(values, dtype=np.float64)
+    for precision in range(max_precision + 1):
+        scale = 10 ** precision
+        if values.size == 0 or np.max(np.abs(np.rint(values * scale) / scale - values)) <= max_error:
+            return precision
+    return max_precision
+
+
+def _format_numbers(values, precision, letters, closes):
+    """ format integer values of 10**-precision units, every value can be preceded by a command letter
+    and followed by a close, separators are only written where the numbers would run together,
+    the numbers are formatted from their integer and trimmed fraction digits by one template per number
+    """
+    scale = 10 ** precision
+    integer, fraction = np.divmod(np.abs(values), scale)
+    digits = np.where(fraction > 0, precision, 0)
+    for _ in range(precision):  # trailing zeros
+        zero = (fraction > 0) & (fraction % 10 == 0)
+        fraction = np.where(zero, fraction // 10, fraction)
+        digits -= zero
+    negative = values < 0
+    has_dot = digits > 0
+    has_integer = (integer > 0) | ~has_dot  # 0.5 is written as .5
+    number_before = np.concatenate(([False], letters[1:] == NONE))
+    dot_before = np.concatenate(([False], has_dot[:-1]))
+    space = number_before & ~negative & ~(~has_integer & dot_before)
+
+    templates = np.array([f'{name}{sep}{sign}{i}{f}{z}'
+                          for name in LETTERS for sep in ('', ' ') for sign in ('', '-') for i in ('', '%d')
+                          for f in [''] + [f'.%0{d}d' for d in range(1, precision + 1)] for z in ('', 'z')], dtype=object)
+    key = ((((letters * 2 + space) * 2 + negative) * 2 + has_integer) * (precision + 1) + digits) * 2 + closes
+    args = np.column_stack((integer, fraction))[np.column_stack((has_integer, has_dot))]
+    return ''.join(templates[key].tolist()) % tuple(args.tolist())
+
+
+def _relative_points(q, codes, close_after):
+    """ points relative to the current point before their command, the last end point,
+    or the subpath start after a close
+    """
+    index = np.arange(len(q))
+    is_start = codes != CURVE_POINT
+    is_end = np.concatenate((is_start[1:], [True]))
+    command_start = np.maximum.accumulate(np.where(is_start, index, 0))
+    subpath_start = np.maximum.accumulate(np.where(codes == MOVE, index, 0))
+    current = np.where(close_after, subpath_start, index)  # current point after an end point
+    last_end = np.maximum.accumulate(np.where(is_end, index, -1))
+    before = np.concatenate(([-1], last_end[:-1]))[command_start]
+    return q - np.where(before[:, None] >= 0, q[current[np.maximum(before, 0)]], 0)
+
+
+def _command_letters(letters, close_after):
+    """ drop the implicit command letters, a repeated command or a line after a relative move """
+    starts = np.flatnonzero(letters != NONE)
+    previous = np.concatenate(([NONE], letters[starts[:-1]]))
+    previous[np.concatenate(([False], close_after[starts[1:] - 1]))] = CLOSE
+    command = letters[starts]
+    implicit = ((command == previous) & (command != REL_MOVE)) | ((command == REL_LINE) & (previous == REL_MOVE))
+    letters[starts[implicit]] = NONE
+    return letters
+
+
+def _path_data(codes, close_after, points, max_error, precision):
+    """ path d of the point command codes, see path_data """
+    if precision is None:
+        precision = path_precision(points, max_error)
+    rel = _relative_points(np.rint(points * 10 ** precision).astype(np.int64), codes, close_after)
+
+    line = codes == LINE
+    horizontal = line & (rel[:, 1] == 0)
+    vertical = line & (rel[:, 0] == 0) & ~horizontal
+    keep = ~(horizontal & (rel[:, 0] == 0) & ~close_after)  # repeated points
+    letters = np.array([REL_MOVE, REL_LINE, REL_CURVE, NONE])[codes]  # no letters of the bezier continuation points
+    letters[horizontal] = REL_H
+    letters[vertical] = REL_V
+    letters[0] = ABS_MOVE
+    letters, rel, close_after = letters[keep], rel[keep], close_after[keep]
+    horizontal, vertical = horizontal[keep], vertical[keep]
+    letters = _command_letters(letters, close_after)
+
+    numbers = np.column_stack((~vertical, ~horizontal))
+    number_letters = np.column_stack((letters, np.full(len(letters), NONE)))
+    number_letters[vertical, 1] = letters[vertical]
+    number_letters[vertical, 0] = NONE
+    number_closes = np.zeros(numbers.shape, dtype=bool)
+    number_closes[close_after & ~horizontal, 1] = True
+    number_closes[close_after & horizontal, 0] = True
+    return _format_numbers(rel[numbers], precision, number_letters[numbers], number_closes[numbers])
+
+
+def path_data(commands, points, max_error=0.05, precision=None):
+    """ compact svg path d of absolute points, points are rounded on one grid so
+    the relative coordinates don't accumulate errors
+
+    Args:
+        commands (list): command of every point, 'M' move, 'L' line, 'C' first control point of
+            a cubic bezier and 'c' its next two points, a 'z' before or after the command closes the subpath
+        points (array): N*2 absolute points
+        max_error (float, optional): maximum rounding error of the coordinates. Defaults to 0.05.
+        precision (int, optional): decimals of the coordinates, None picks the fewest within max_error. Defaults to None.
+
+    Returns:
+        str: path d, e.g. 'M10 10l5-5h.5z'
+    """
+    points = np.asarray(points, dtype=np.float64).reshape((-1, 2))
+    if len(points) == 0:
+        return ''
+    parsed = {c: (COMMANDS.index(c.strip('z')), c.startswith('z'), c.endswith('z')) for c in set(commands)}
+    parsed = np.array([parsed[c] for c in commands], dtype=np.int64).reshape((-1, 3))
+    close_after = parsed[:, 2] > 0
+    close_after[:-1] |= parsed[1:, 1] > 0
+    return _path_data(parsed[:, 0], close_after, points, max_error, precision)
+
+
+def polyline_data(pts, close=False, max_error=0.05, precision=None):
+    """ compact svg path d of a polyline, see path_data """
+    points = np.asarray(pts, dtype=np.float64).reshape((-1, 2))
+    if len(points) == 0:
+        return ''
+    codes = np.full(len(points), LINE)
+    codes[0] = MOVE
+    close_after = np.zeros(len(points), dtype=bool)
+    close_after[-1] = close
+    return _path_data(codes, close_after, points, max_error, precision)
@@ -0,0 +1,118 @@
+# -*- encoding: utf-8 -*-
+# Date: 18/Oct/2026
+# Author: Steven Huang, Auckland, NZ
+# License: MIT License
+"""
+Description: Polyline simplification, Ramer-Douglas-Peucker and Visvalingam-Whyatt,
+tolerance is in the units of the points, e.g. svg output units
+"""
+import heapq
+import numpy as np
+
+__all__ = ['rdp_mask', 'vw_mask', 'simplify_mask', 'simplify']
+
+
+def _segment_distance(px, py, ax, ay, bx, by):
+    """ distances of points (px, py) to segments (ax, ay)-(bx, by) """
+    abx, aby = bx - ax, by - ay
+    apx, apy = px - ax, py - ay
+    l2 = abx * abx + aby * aby
+    t = np.clip((apx * abx + apy * aby) / np.where(l2 > 0, l2, 1), 0, 1)
+    dx, dy = apx - t * abx, apy - t * aby
+    return np.sqrt(dx * dx + dy * dy)
+
+
+def rdp_mask(pts, tolerance):
+    """ Ramer-Douglas-Peucker, points kept within tolerance distance of the simplified polyline,
+    all the ranges of one recursion level are split in one vectorized step """
+    pts = np.asarray(pts, dtype=np.float64)
+    x, y = np.ascontiguousarray(pts[:, 0]), np.ascontiguousarray(pts[:, 1])
+    n = pts.shape[0]
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, -1]] = True
+    starts, ends = np.array([0]), np.array([n - 1])
+    while starts.size:
+        counts = ends - starts - 1
+        valid = counts > 0
+        starts, ends, counts = starts[valid], ends[valid], counts[valid]
+        if not starts.size:
+            break
+
+        seg = np.repeat(np.arange(starts.size), counts)  # range of every inner point
+        offsets = np.cumsum(counts) - counts
+        idx = np.arange(counts.sum()) + np.repeat(starts + 1 - offsets, counts)
+        d = _segment_distance(x[idx], y[idx], x[starts][seg], y[starts][seg], x[ends][seg], y[ends][seg])
+        dmax = np.maximum.reduceat(d, offsets)
+        first = np.flatnonzero(d == dmax[seg])
+        first = first[np.concatenate(([True], seg[first[1:]] != seg[first[:-1]]))]  # first farthest point of every range
+
+        split = dmax > tolerance
+        mid = idx[first[split]]
+        keep[mid] = True
+        starts, ends = np.concatenate((starts[split], mid)), np.concatenate((mid, ends[split]))
+    return keep
+
+
+def _triangle_areas(a, b, c):
+    """ areas of the triangles of N*2 points a, b and c """
+    return 0.5 * np.abs((b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (c[:, 0] - a[:, 0]) * (b[:, 1] - a[:, 1]))
+
+
+def vw_mask(pts, tolerance):
+    """ Visvalingam-Whyatt, the point of the smallest triangle area with its neighbours is removed
+    and the areas of its neighbours are updated, until all the areas are at least tolerance**2,
+    a heap of the areas and linked neighbours, O(N log N) """
+    pts = np.asarray(pts, dtype=np.float64)
+    n = pts.shape[0]
+    keep = np.ones(n, dtype=bool)
+    if n < 3:
+        return keep
+    threshold = tolerance ** 2
+    x, y = pts[:, 0].tolist(), pts[:, 1].tolist()
+    prev, succ = list(range(-1, n - 1)), list(range(1, n + 1))
+    areas = [np.inf] + _triangle_areas(pts[:-2], pts[1:-1], pts[2:]).tolist() + [np.inf]
+    heap = [(area, i) for i, area in enumerate(areas) if area < threshold]  # ties removed in index order
+    heapq.heapify(heap)
+    while heap:
+        area, i = heapq.heappop(heap)
+        if not keep[i] or area != areas[i]:  # removed or outdated
+            continue
+        keep[i] = False
+        a, c = prev[i], succ[i]
+        succ[a], prev[c] = c, a
+        for j in (a, c):
+            if 0 < j < n - 1:
+                p, q = prev[j], succ[j]
+                areas[j] = 0.5 * abs((x[j] - x[p]) * (y[q] - y[p]) - (x[q] - x[p]) * (y[j] - y[p]))
+                if areas[j] < threshold:
+                    heapq.heappush(heap, (areas[j], j))
+    return keep
+
+
+def simplify_mask(pts, tolerance, method='rdp', closed=False):
+    """ mask of the points kept by simplification
+
+    Args:
+        pts (array): N*2 points of a polyline
+        tolerance (float): maximum deviation, in the units of the points
+        method (str, optional): 'rdp' or 'vw'. Defaults to 'rdp'.
+        closed (bool, optional): the polyline is a closed polygon. Defaults to False.
+    """
+    pts = np.asarray(pts)
+    if pts.shape[0] < 3 or not tolerance:
+        return np.ones(pts.shape[0], dtype=bool)
+    if closed:
+        pts = np.vstack((pts, pts[:1]))
+    if method == 'rdp':
+        keep = rdp_mask(pts, tolerance)
+    elif method == 'vw':
+        keep = vw_mask(pts, tolerance)
+    else:
+        raise ValueError(f'Unknown simplification method: {method}')
+    return keep[:-1] if closed else keep
+
+
+def simplify(pts, tolerance, method='rdp', closed=False):
+    """ simplified N*2 points of a polyline, see simplify_mask """
+    pts = np.asarray(pts)
+    return pts[simplify_mask(pts, tolerance, method, closed)]
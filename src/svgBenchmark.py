@@ -0,0 +1,71 @@
+# -*- encoding: utf-8 -*-
+# Date: 18/Oct/2026
+# Author: Steven Huang, Auckland, NZ
+# License: MIT License
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+Description: Benchmarks of svg element generating
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+import time
+import numpy as np
+from svg.file import SVGFileV2, SVGStreamWriter
+from svg.basic import draw_circle, draw_only_line
+from common import IMAGE_OUTPUT_PATH
+from common_path import join_path
+
+
+def time_it(title, func, *args, N=1, **kwargs):
+    """ run func once and print cost per element """
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    cost = time.perf_counter() - start
+    print(f'{title}: total {cost:.3f}s, per element {cost * 1e6 / N:.3f}us')
+    return cost
+
+
+def draw_string_path(svg, pts, r=1):
+    """ old path, format xml string and parse it again """
+    for x, y in pts:
+        svg.draw(draw_circle(x, y, r, color='black'))
+        svg.draw(draw_only_line(x, y, 0, 0))
+
+
+def draw_add_path(svg, pts, r=1):
+    """ structured path, create nodes from attributes """
+    for x, y in pts:
+        svg.add_circle(x, y, r, fill='black')
+        svg.add_line(x, y, 0, 0)
+
+
+def benchmark_draw(N=1000000):
+    """ compare SVGFileV2.draw(string) with SVGFileV2.add(attributes) """
+    pts = np.round(np.random.random((N // 2, 2)) * 100, 1).tolist()
+
+    svg = SVGFileV2(join_path(IMAGE_OUTPUT_PATH, r'benchmark_draw.svg'), W=100, H=100)
+    time_it('draw(string)', draw_string_path, svg, pts, N=N)
+
+    svg = SVGFileV2(join_path(IMAGE_OUTPUT_PATH, r'benchmark_add.svg'), W=100, H=100)
+    time_it('add(attributes)', draw_add_path, svg, pts, N=N)
+
+
+def benchmark_bulk(N=1000000):
+    """ compare per element drawing with bulk add_lines from numpy array """
+    lines = np.random.random((N, 4)) * 100
+
+    svg = SVGFileV2(join_path(IMAGE_OUTPUT_PATH, r'benchmark_line.svg'), W=100, H=100)
+    time_it('add_line', lambda: [svg.add_line(*i) for i in np.round(lines, 1).tolist()], N=N)
+
+    svg = SVGFileV2(join_path(IMAGE_OUTPUT_PATH, r'benchmark_lines.svg'), W=100, H=100)
+    time_it('add_lines', svg.add_lines, lines, N=N)
+
+    svg = SVGStreamWriter(join_path(IMAGE_OUTPUT_PATH, r'benchmark_lines_stream.svg'), W=100, H=100)
+    time_it('add_lines(streaming)', svg.add_lines, lines, N=N)
+
+
+def main():
+    """ main function """
+    benchmark_draw()
+    benchmark_bulk()
+
+
+if __name__ == '__main__':
+    main()
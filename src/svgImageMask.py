@@ -6,18 +6,24 @@
 Description: Image to svg
 """""""""""""""""""""""""""""""""""""""""""""""""""""
 
+import re
+from collections import deque, namedtuple
+from functools import partial
+from multiprocessing import Pool
 import cv2
 import potrace  # pip install potracer
 import numpy as np
-from svg.file import SVGFileV2
-from svg.basic import random_color, color_fader, draw_circle, draw_rect, random_color_hsv
-from svg.basic import convert_rgb, draw_any, clip_float, draw_path
+from scipy.cluster.vq import vq
+from svg.file import SVGFileV2, SVGStreamWriter, bulk_fragments, circle_columns, rect_columns
+from svg.basic import random_color, color_fader_array, draw_circle, draw_rect, random_color_hsv
+from svg.basic import convert_rgb, convert_rgb_array, draw_any, draw_path
 from svg.basic import draw_only_path, add_style, get_styles
-from svg.geo_transformation import translation_pts_xy
-from svg.geo_transformation import split_points, combine_xy, zoom_non_pts_xy
+from svg.disk_cache import DiskCache
+from svg.simplify import simplify_mask
+from svg.path_data import path_data
 from svgSmile import drawSmileSVG
 from common import IMAGE_OUTPUT_PATH
-from common_path import join_path
+from common_path import join_path, traverse_files
 
 
 def getImgHW(img):
@@ -43,6 +49,40 @@ def loadImg(file, mode=cv2.IMREAD_COLOR):
     return img
 
 
+def open_image(file):
+    """ open an image without reading it into memory when possible, .npy (H*W*3 rgb)
+    and binary .ppm files are memory-mapped, other formats are decoded by loadImg """
+    ext = file.lower().rsplit('.', 1)[-1]
+    if ext == 'npy':
+        return np.load(file, mmap_mode='r')
+    if ext == 'ppm':
+        with open(file, 'rb') as f:
+            header = f.read(512)
+        tokens, pos = [], 0
+        while len(tokens) < 4 and pos < len(header):  # magic, width, height, maxval
+            while pos < len(header) and header[pos:pos + 1].isspace():
+                pos += 1
+            if header[pos:pos + 1] == b'#':
+                pos = header.find(b'\n', pos)
+                if pos < 0:  # truncated comment
+                    break
+                continue
+            end = pos
+            while end < len(header) and not header[end:end + 1].isspace():
+                end += 1
+            if end == len(header):  # every token is followed by a whitespace
+                break
+            tokens.append(header[pos:end])
+            pos = end
+        if len(tokens) < 4 or not all(t.isdigit() for t in tokens[1:]):
+            raise ValueError(f'Malformed ppm header: {file}')
+        if tokens[0] != b'P6' or int(tokens[3]) > 255:
+            raise ValueError(f'Only 8 bits binary ppm is supported: {file}')
+        return np.memmap(file, dtype=np.uint8, mode='r', offset=pos + 1,
+                         shape=(int(tokens[2]), int(tokens[1]), 3))
+    return loadImg(file, cv2.IMREAD_COLOR)
+
+
 def getImagChannel(img):
     if img.ndim == 3:  # color r g b channel
         return 3
@@ -92,6 +132,122 @@ def OtsuMethodThresHold(img):
     return threshold
 
 
+def block_mean(img, step, per_channel=True):
+    """ mean of every step*step tile, the image is reshaped into (H/step, W/step, step, step, C)
+    blocks, the remainder rows and columns are dropped
+
+    Args:
+        img (array): H*W or H*W*C image
+        step (int): tile size
+        per_channel (bool, optional): mean of each channel, or of all channels. Defaults to True.
+
+    Returns:
+        array: (H/step, W/step, C) or (H/step, W/step) tile means
+    """
+    h, w = img.shape[0] // step, img.shape[1] // step
+    img = img[:h * step, :w * step]
+    if img.ndim == 2:
+        img = img[..., None]
+    blocks = img.reshape(h, step, w, step, img.shape[2]).swapaxes(1, 2)
+    axis = (2, 3) if per_channel else (2, 3, 4)
+    count = step * step * (1 if per_channel else img.shape[2])
+    return blocks.sum(axis=axis, dtype=np.int64) / count  # integer sums keep np.mean's precision
+
+
+def median_cut(colors, n_colors):
+    """ median cut palette, the box with the largest channel range is split at its median
+    until there are n_colors boxes, the palette is the mean of each box """
+    boxes = [colors]
+    while len(boxes) < n_colors:
+        ranges = [np.ptp(b, axis=0).max() if b.shape[0] > 1 else -1 for b in boxes]
+        i = int(np.argmax(ranges))
+        if ranges[i] <= 0:
+            break
+        box = boxes.pop(i)
+        box = box[np.argsort(box[:, np.argmax(np.ptp(box, axis=0))], kind='stable')]
+        half = box.shape[0] // 2
+        boxes += [box[:half], box[half:]]
+    return np.array([b.mean(axis=0) for b in boxes])
+
+
+def fit_palette(colors, n_colors=16, method='kmeans', samples=200000):
+    """ build a palette of colors
+
+    Args:
+        colors (array): N*C colors, e.g. rgb pixels
+        n_colors (int, optional): palette size. Defaults to 16.
+        method (str, optional): 'kmeans' or 'median_cut'. Defaults to 'kmeans'.
+        samples (int, optional): maximum colors sampled to build the palette. Defaults to 200000.
+
+    Returns:
+        array: palette K*C uint8 array
+    """
+    sample = np.asarray(colors).reshape((colors.shape[0], -1)).astype(np.float32)
+    if sample.shape[0] > samples:
+        sample = sample[np.random.default_rng(0).choice(sample.shape[0], samples, replace=False)]
+
+    n_colors = min(n_colors, sample.shape[0])
+    if method == 'kmeans':
+        cv2.setRNGSeed(0)
+        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 0.5)
+        _, _, palette = cv2.kmeans(sample, n_colors, None, criteria, 1, cv2.KMEANS_PP_CENTERS)
+    elif method == 'median_cut':
+        palette = median_cut(sample, n_colors)
+    else:
+        raise ValueError(f'Unknown palette method: {method}')
+
+    return np.unique(np.clip(np.rint(palette), 0, 255).astype(np.uint8), axis=0)
+
+
+def assign_palette(colors, palette):
+    """ index of the nearest palette color of each color """
+    colors = np.asarray(colors).reshape((colors.shape[0], -1)).astype(np.float32)
+    labels, _ = vq(colors, palette.astype(np.float32), check_finite=False)
+    return labels
+
+
+def quantize_palette(colors, n_colors=16, method='kmeans', samples=200000):
+    """ quantize colors into a palette, returns (palette K*C uint8 array, N palette indexes) """
+    palette = fit_palette(colors, n_colors, method, samples)
+    return palette, assign_palette(colors, palette)
+
+
+def merge_runs(codes, rects=False):
+    """ run-length encode the horizontal runs of the same code in a 2D array, optionally merge
+    the runs with the same column, length and code in the next rows into rectangles
+
+    Args:
+        codes (array): H*W integer array, e.g. packed colors
+        rects (bool, optional): merge runs vertically into rectangles. Defaults to False.
+
+    Returns:
+        tuple: (rows, cols, widths, heights, codes) arrays of the runs/rectangles
+    """
+    h, w = codes.shape
+    flat = codes.ravel()
+    start = np.ones(flat.shape[0], dtype=bool)
+    start[1:] = flat[1:] != flat[:-1]
+    start[::w] = True  # runs stop at the end of rows
+    idx = np.flatnonzero(start)
+    widths = np.diff(np.append(idx, flat.shape[0]))
+    rows, cols, codes = idx // w, idx % w, flat[idx]
+    heights = np.ones_like(widths)
+    if not rects or h == 1:
+        return rows, cols, widths, heights, codes
+
+    # runs of one rectangle are consecutive rows once sorted by (col, width, code, row)
+    order = np.lexsort((rows, codes, widths, cols))
+    rows, cols, widths, codes = rows[order], cols[order], widths[order], codes[order]
+    first = np.ones(rows.shape[0], dtype=bool)
+    first[1:] = ((cols[1:] != cols[:-1]) | (widths[1:] != widths[:-1]) |
+                 (codes[1:] != codes[:-1]) | (rows[1:] != rows[:-1] + 1))
+    idx = np.flatnonzero(first)
+    heights = np.diff(np.append(idx, rows.shape[0]))
+    rows, cols, widths, codes = rows[idx], cols[idx], widths[idx], codes[idx]
+    order = np.lexsort((cols, rows))  # back to the raster order
+    return rows[order], cols[order], widths[order], heights[order], codes[order]
+
+
 def showimage(img, name='image', auto_size=False):
     flag = cv2.WINDOW_NORMAL
     if auto_size:
@@ -104,65 +260,204 @@ def showimage(img, name='image', auto_size=False):
     cv2.destroyAllWindows()
 
 
+def tile_centers(top, bottom, width, step):
+    """ [x, y] centers of the step*step tiles between rows top and bottom, row by row """
+    y, x = np.meshgrid(np.arange(top, bottom, step) + step / 2,
+                       np.arange(0, width // step * step, step) + step / 2, indexing='ij')
+    return np.column_stack((x.ravel(), y.ravel()))
+
+
+def step_strip_elements(top, img, step, use_circle=False, palette=None, classes=None):
+    """ drawStep elements of one strip, [(tag, columns, attributes)] for add_bulk """
+    coords = tile_centers(top, top + img.shape[0], img.shape[1], step)
+    gray = block_mean(img, step, per_channel=False).reshape(-1, 1)
+    if palette is not None:
+        names, colors = classes[assign_palette(gray, palette)], None
+    else:
+        names, colors = None, color_fader_array(gray[:, 0] / 255)
+
+    if use_circle:
+        return [('circle', circle_columns(coords), {'class': names, 'r': step / 2, 'fill': colors})]
+    sizes = np.full(len(coords), step)  # integer sizes are written as integers
+    rects = {'x': coords[:, 0], 'y': coords[:, 1], 'width': sizes, 'height': sizes}
+    if palette is not None:
+        return [('rect', rects, {'class': names})]
+    return [('rect', rects, {'fill': colors, 'stroke': 'None', 'stroke_width': 0.5})]
+
+
+def color_strip_elements(top, img, step, merge=None, palette=None, classes=None):
+    """ drawColor elements of one strip, [(tag, columns, attributes)] for add_bulk """
+    pixels = img[::step, ::step, :3].astype(np.uint32)
+    if palette is not None:
+        codes = assign_palette(pixels.reshape(-1, 3), palette)
+    else:
+        codes = (pixels[..., 0] << 16) | (pixels[..., 1] << 8) | pixels[..., 2]
+    codes = codes.reshape(pixels.shape[:2])
+
+    if merge is None:
+        rows, cols = np.indices(codes.shape)
+        rows, cols, codes = rows.ravel() * step + top, cols.ravel() * step, codes.ravel()
+        rects = np.column_stack((cols, rows, np.ones((cols.size, 2), dtype=np.int64)))
+    else:
+        rows, cols, widths, heights, codes = merge_runs(codes, rects=merge == 'rects')
+        rects = np.column_stack((cols, rows, widths, heights)) * step
+        rects[:, 1] += top
+
+    if palette is not None:
+        return [('rect', rect_columns(rects), {'class': classes[codes]})]
+    colors = convert_rgb_array(np.column_stack(((codes >> 16) & 0xff, (codes >> 8) & 0xff, codes & 0xff)))
+    return [('rect', rect_columns(rects), {'fill': colors, 'stroke': 'None', 'stroke_width': 0})]
+
+
+def tile_color_strip_elements(top, img, step, use_circle=False):
+    """ elements of the mean color of every tile of one strip, drawn at the tile center """
+    coords = tile_centers(top, top + img.shape[0], img.shape[1], step)
+    colors = convert_rgb_array(block_mean(img, step).reshape(-1, img.shape[2]))
+    if use_circle:
+        return [('circle', circle_columns(coords), {'r': step / 2, 'fill': colors})]
+    return [('rect', {'x': coords[:, 0], 'y': coords[:, 1]},
+             {'width': step, 'height': step, 'fill': colors, 'stroke': 'None', 'stroke_width': 0.5})]
+
+
+def _strip_fragments(task):
+    """ pool worker, svg fragments and element numbers of one strip """
+    strip_elements, top, img = task
+    return [(list(bulk_fragments(tag, columns, **attris)), len(next(iter(columns.values()))))
+            for tag, columns, attris in strip_elements(top, img)]
+
+
 class SVGImageMask:
     """ image to svg """
 
-    def __init__(self, image_file, dst_svgfile, step=1):
+    def __init__(self, image_file, dst_svgfile, step=1, streaming=False, strip_rows=None):
+        """ strip_rows: process the image in strips of rows to limit memory, the image is opened by
+        open_image (memory-mapped .npy/.ppm) and the svg is streamed """
         # cv2.IMREAD_GRAYSCALE
-        self.image = loadImg(image_file, cv2.IMREAD_COLOR)
+        if strip_rows:
+            self.image = open_image(image_file)
+            streaming = True
+        else:
+            self.image = loadImg(image_file, cv2.IMREAD_COLOR)
         self.height = self.image.shape[0]
         self.width = self.image.shape[1]
         self.step = step
+        self.strip_rows = strip_rows
         self.svg_h = int((self.height // step) * step)
         self.svg_w = int((self.width // step) * step)
-        self.svg = SVGFileV2(dst_svgfile, W=self.svg_w, H=self.svg_h)
+        svg_class = SVGStreamWriter if streaming else SVGFileV2  # streaming for huge images
+        self.svg = svg_class(dst_svgfile, W=self.svg_w, H=self.svg_h)
+        self.palette_classes = {}  # palette color -> css class
         print('step=', step, 'image H,W=', self.height,
               self.width, 'SVG H,W=', self.svg_h, self.svg_w)
 
-    def drawStep(self, use_circle=False):
-        r = self.step / 2
-        for i in range(0, self.svg_h, self.step):
-            for j in range(0, self.svg_w, self.step):
-                x = i + 1 / 2 * self.step
-                y = j + 1 / 2 * self.step
-
-                roi = self.image[i:i + self.step, j:j + self.step]
-                # print(i,j,self.svg_h,self.svg_w,i+self.step,j+self.step)
-                color = color_fader(mix=np.mean(roi) / 255)
-                if use_circle:
-                    self.svg.draw(draw_circle(y, x, r, color=color))
-                else:
-                    self.svg.draw(
-                        draw_rect(y, x, self.step, self.step, color=color))
+    def strips(self, rows=None):
+        """ (top row, image strip) of whole tiles, strips of strip_rows rows, or the whole image """
+        rows = rows or self.strip_rows or self.svg_h
+        rows = max(self.step, rows // self.step * self.step)
+        for top in range(0, self.svg_h, rows):
+            yield top, np.asarray(self.image[top:min(top + rows, self.svg_h), :self.svg_w])
+
+    def tile_centers(self, top=0, bottom=None):
+        """ [x, y] centers of the step*step tiles between rows top and bottom, row by row """
+        return tile_centers(top, self.svg_h if bottom is None else bottom, self.svg_w, self.step)
+
+    def _palette_classes(self, colors):
+        """ one short css class per palette color, colors already styled reuse their class """
+        for color in colors:
+            if color not in self.palette_classes:
+                self.palette_classes[color] = f'p{len(self.palette_classes)}'
+                self.svg.add_svg_style('.' + self.palette_classes[color], {'fill': color})
+        return np.array([self.palette_classes[c] for c in colors])
+
+    def _fit_palette(self, strip_colors, palette_size, palette_method, samples=200000):
+        """ fit a palette to the colors of all strips, strips are sampled when the image is tiled """
+        rate = min(1, samples / ((self.svg_h // self.step) * (self.svg_w // self.step))) if self.strip_rows else 1
+        rng = np.random.default_rng(0)
+        colors = []
+        for _, img in self.strips():
+            c = strip_colors(img)
+            colors.append(c[rng.random(c.shape[0]) < rate] if rate < 1 else c)
+        return fit_palette(np.concatenate(colors), palette_size, palette_method, samples)
+
+    def _draw_strips(self, strip_elements, workers=1, split=True):
+        """ draw the elements of every strip, returns the element number
+
+        Strips are converted to svg fragments in workers processes when workers > 1 and the fragments
+        are added in order, so the output is the same as the serial mode. Without strip_rows the image
+        is split into strips for the workers, unless split is False.
+        """
+        num = 0
+        if workers <= 1:
+            for top, img in self.strips():
+                for tag, columns, attris in strip_elements(top, img):
+                    self.svg.add_bulk(tag, columns, **attris)
+                    num += len(next(iter(columns.values())))
+            return num
+
+        rows = self.strip_rows or (-(-self.svg_h // (4 * workers)) if split else self.svg_h)
+        pending = deque()  # bounded, strips are read only when a worker is about to be free
+
+        def add_strip():
+            nonlocal num
+            for fragments, n in pending.popleft().get():
+                self.svg.add_fragments(fragments)
+                num += n
+
+        with Pool(workers) as pool:
+            for top, img in self.strips(rows):
+                pending.append(pool.apply_async(_strip_fragments, ((strip_elements, top, img),)))
+                if len(pending) > 2 * workers:
+                    add_strip()
+            while pending:
+                add_strip()
+        return num
+
+    def drawStep(self, use_circle=False, palette_size=None, palette_method='kmeans', workers=1):
+        """ draw the gray mean of every tile as a rect or circle
+
+        Args:
+            use_circle (bool, optional): draw circles instead of rects. Defaults to False.
+            palette_size (int, optional): quantize the tile colors into a palette of css classes. Defaults to None.
+            palette_method (str, optional): 'kmeans' or 'median_cut'. Defaults to 'kmeans'.
+            workers (int, optional): processes to convert strips in parallel. Defaults to 1.
+        """
+        palette, classes = None, None
+        if palette_size:
+            palette = self._fit_palette(lambda img: block_mean(img, self.step, per_channel=False).reshape(-1, 1),
+                                        palette_size, palette_method)
+            classes = self._palette_classes(color_fader_array(palette[:, 0] / 255))
+        self._draw_strips(partial(step_strip_elements, step=self.step, use_circle=use_circle,
+                                  palette=palette, classes=classes), workers)
 
     def get_coordinates_color(self):
-        coords = []
-        colors = []
-        for i in range(0, self.svg_h, self.step):
-            for j in range(0, self.svg_w, self.step):
-                y = i + 1 / 2 * self.step
-                x = j + 1 / 2 * self.step
-
-                c = self.image[i:i + self.step, j:j + self.step, :]
-                # print('c, c.shape=', c, c.shape)
-
-                c = np.mean(c, axis=0)
-                c = np.mean(c, axis=0)
-                c = convert_rgb(c)
-                # print('c=', c)
-                coords.append([x, y])
-                colors.append(c)
-                # break
-            # break
-        return np.array(coords), np.array(colors)
-
-    def drawColor(self):
-        r = 1
-        for i in range(0, self.svg_h, self.step):
-            for j in range(0, self.svg_w, self.step):
-                color = convert_rgb(self.image[i, j, :])
-                self.svg.draw(
-                    draw_rect(j, i, r, r, stroke_width=0, color=color))
+        colors = [block_mean(img, self.step).reshape(-1, img.shape[2]) for _, img in self.strips()]
+        return self.tile_centers(), convert_rgb_array(np.concatenate(colors))
+
+    def drawTileColors(self, use_circle=False, workers=1):
+        """ draw the mean color of every tile at the tile center """
+        self._draw_strips(partial(tile_color_strip_elements, step=self.step, use_circle=use_circle), workers)
+
+    def drawColor(self, merge=None, palette_size=None, palette_method='kmeans', workers=1):
+        """ draw the top-left pixel of every tile as a rect
+
+        Args:
+            merge (str, optional): None, one 1*1 rect per pixel; 'runs', merge the horizontal runs of
+                the same color; 'rects', also merge the same runs in the next rows into rectangles,
+                rectangles don't cross strips. Merged rects cover their whole step*step tiles. Defaults to None.
+            palette_size (int, optional): quantize the pixel colors into a palette of css classes,
+                quantized colors also merge into longer runs. Defaults to None.
+            palette_method (str, optional): 'kmeans' or 'median_cut'. Defaults to 'kmeans'.
+            workers (int, optional): processes to convert strips in parallel. Defaults to 1.
+        """
+        palette, classes = None, None
+        if palette_size:
+            palette = self._fit_palette(lambda img: img[::self.step, ::self.step, :3].reshape(-1, 3),
+                                        palette_size, palette_method)
+            classes = self._palette_classes(convert_rgb_array(palette))
+        num = self._draw_strips(partial(color_strip_elements, step=self.step, merge=merge,
+                                        palette=palette, classes=classes), workers, split=merge != 'rects')
+        if merge is not None:
+            print('merged', (self.svg_h // self.step) * (self.svg_w // self.step), 'pixels into', num, 'rects')
 
 
 def maskImage():
@@ -202,144 +497,281 @@ def imgSvgElement():
     svg.draw(draw_any('image ', **style_dict))
 
 
-def image2_svg(use_rect=True):
-    def drawPointsCircle_colors(svg, pts, r, colors):
-        for i, pt in enumerate(pts):
-            x = clip_float(pt[0])
-            y = clip_float(pt[1])
-            svg.draw(draw_circle(x, y, radius=r, color=colors[i]))
-
-    def drawPointsRect_colors(svg, pts, r, colors):
-        for i, pt in enumerate(pts):
-            x = clip_float(pt[0])
-            y = clip_float(pt[1])
-            svg.draw(draw_rect(x, y, r, r, color=colors[i]))
-
+def image2_svg(use_rect=True, workers=1):
     f = r'.\res\trumps.jpg'
     d = join_path(IMAGE_OUTPUT_PATH, r'trump.svg')
     step = 1
     mask = SVGImageMask(f, d, step=step)  # 4, 8
-    coords, colors = mask.get_coordinates_color()
-    print('coords, coords.shape', coords, coords.shape)
-    print('colors, colors.shape', colors, colors.shape)
-
-    if use_rect:
-        drawPointsRect_colors(mask.svg, coords, r=step, colors=colors)
-    else:
-        drawPointsCircle_colors(mask.svg, coords, r=step / 2, colors=colors)
+    mask.drawTileColors(use_circle=not use_rect, workers=workers)
 
 
 def my_path_potrace(paths, N=2):
-    # print('len(path)=', len(paths))
-
-    # Iterate over path curves
-    for curve in paths:
-        start_pt = curve.start_point
-        # pts = curve.decomposition_points
-        # print('pts=', pts)
-        # path = 'M %f %f ' % (clip_float(start_pt.x, N), clip_float(start_pt.y, N))
-        path = f'M {clip_float(start_pt.x, N)} {clip_float(start_pt.y, N)} '
-        # print("start_point =", start_pt)
-
-        for segment in curve:
-            # print('end_pt=', end_pt, segment.is_corner)
-            if segment.is_corner:
-                c = segment.c
-                # print('c=', c, 'x=', c.x, 'y=', c.y)
-
-                end_pt = segment.end_point
-                end = f'L {clip_float(end_pt.x, N)} {clip_float(end_pt.y, N)}'
-                seg = f'L {clip_float(c.x, N)} {clip_float(c.y, N)} ' + end
-            else:
-                c1 = segment.c1
-                c2 = segment.c2
-                # print('c1=', c1, 'x=', c1.x, 'y=', c1.y)
-                # print('c2=', c2, 'x=', c2.x, 'y=', c2.y)
-                end_pt = segment.end_point
-                end = f'{clip_float(end_pt.x, N)} {clip_float(end_pt.y, N)}'
-                seg = f'C {clip_float(c1.x, N)},{clip_float(c1.y, N)} {clip_float(c2.x, N)},{clip_float(c2.y, N)} ' + end
-            path += seg
-
-        path += 'z'
-        yield path
-
-
-def get_potrace_path(data):
+    """ svg path d of every curve, coordinates are rounded to N decimals """
+    templates = {'start': 'M %s %s ', 'corner': ('', 'L %s %s ', 'L %s %s'),
+                 'bezier': ('C %s,%s ', '%s,%s ', '%s %s'), 'end': 'z\n'}
+    tokens, values = potrace_tokens(paths, templates)
+    yield from format_path_tokens(tokens, values, N).splitlines()
+
+
+POTRACE_PARAMS = {'turdsize': 2, 'turnpolicy': 4, 'alphamax': 1.0, 'opticurve': True, 'opttolerance': 0.2}
+TRACED_PATH_VERSION = 1  # bump when TracedPath arrays change to invalidate cached traces
+
+
+TracePoint = namedtuple('TracePoint', 'x y')  # as potrace point
+TracedSegment = namedtuple('TracedSegment', 'is_corner c c1 c2 end_point')  # as potrace corner/bezier segment
+
+
+def _traced_segment(corner, pts):
+    c1, c2, end_point = (TracePoint(x, y) for x, y in pts)
+    return TracedSegment(corner, c2, c1, c2, end_point)
+
+
+class TracedCurve(list):
+    """ segments of a traced curve, as potrace curve """
+
+    def __init__(self, corners, pts, decomposition):
+        super().__init__(_traced_segment(c, p) for c, p in zip(corners, pts))
+        self.start_point = self[-1].end_point if self else None
+        self.decomposition_points = [TracePoint(x, y) for x, y in decomposition]
+
+    @property
+    def segments(self):
+        return self
+
+
+class TracedPath:
+    """ potrace path stored in compact arrays, curves are created on access as potrace curves
+
+    corners: S segment corner flags, points: S*3*2 segment control points (c1, c2, end point),
+    decomposition: P*2 integer outline points, segment_index/point_index: N+1 offsets of the curves
+    """
+
+    def __init__(self, corners, points, segment_index, decomposition, point_index):
+        self.corners = corners
+        self.points = points
+        self.segment_index = segment_index
+        self.decomposition = decomposition
+        self.point_index = point_index
+
+    @classmethod
+    def from_potrace(cls, path):
+        segments = [s._segment for curve in path for s in curve]  # pylint: disable=protected-access
+        corners = np.array([s.is_corner for curve in path for s in curve], dtype=bool)
+        points = np.array([[(p.x, p.y) for p in s.c] for s in segments], dtype=np.float64).reshape((-1, 3, 2))
+        decomposition = np.array([(p.x, p.y) for curve in path for p in curve.decomposition_points],
+                                 dtype=np.int32).reshape((-1, 2))
+        segment_index = np.cumsum([0] + [len(curve) for curve in path])
+        point_index = np.cumsum([0] + [len(curve.decomposition_points) for curve in path])
+        return cls(corners, points, segment_index, decomposition, point_index)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(arrays['corners'], arrays['points'], arrays['segment_index'],
+                   arrays['decomposition'], arrays['point_index'])
+
+    def simplified(self, tolerance, method='rdp', zoom_x=1, zoom_y=1):
+        """ TracedPath of the decomposition polygons simplified within tolerance, in zoomed units """
+        keep = np.ones(len(self.decomposition), dtype=bool)
+        zoom = np.array([zoom_x, zoom_y])
+        for p0, p1 in zip(self.point_index[:-1], self.point_index[1:]):
+            keep[p0:p1] = simplify_mask(self.decomposition[p0:p1] * zoom, tolerance, method, closed=True)
+        point_index = np.concatenate(([0], np.cumsum(keep)[self.point_index[1:] - 1]))
+        return TracedPath(self.corners, self.points, self.segment_index, self.decomposition[keep], point_index)
+
+    def arrays(self):
+        return {'corners': self.corners, 'points': self.points, 'segment_index': self.segment_index,
+                'decomposition': self.decomposition, 'point_index': self.point_index}
+
+    def __len__(self):
+        return len(self.segment_index) - 1
+
+    def __getitem__(self, i):
+        if not -len(self) <= i < len(self):
+            raise IndexError('TracedPath index out of range')
+        i %= len(self)
+        s0, s1 = self.segment_index[i], self.segment_index[i + 1]
+        p0, p1 = self.point_index[i], self.point_index[i + 1]
+        return TracedCurve(self.corners[s0:s1].tolist(), self.points[s0:s1].tolist(),
+                           self.decomposition[p0:p1].tolist())
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    @property
+    def curves(self):
+        return self
+
+
+def get_potrace_path(data, cache_path=None, cache_size=1024, **params):
     """get path from raster image data
 
     Args:
         data (array): M*N array, white and black image
+        cache_path (str, optional): folder to cache traced paths, keyed on the image and the potrace
+            parameters, a cached trace is returned as TracedPath. Defaults to None.
+        cache_size (int, optional): maximum size of the cache, MB. Defaults to 1024.
+        params: potrace trace parameters, turdsize, turnpolicy, alphamax, opticurve, opttolerance
     """
+    params = {**POTRACE_PARAMS, **params}
+    if cache_path is None:
+        # Create a bitmap from the array and trace it to a path
+        return potrace.Bitmap(data).trace(**params)
+
+    cache = DiskCache(cache_path, cache_size, prefix='potrace', compress=True)
+    key = cache.key(version=TRACED_PATH_VERSION, image=np.asarray(data), **params)
+    arrays = cache.load(key)
+    if arrays is None:
+        path = TracedPath.from_potrace(potrace.Bitmap(data).trace(**params))
+        cache.save(key, **path.arrays())
+        return path
+    return TracedPath.from_arrays(arrays)
 
-    # Create a bitmap from the array
-    bmp = potrace.Bitmap(data)
-    # Trace the bitmap to a path
-    path = bmp.trace()
-    return path
+
+def _trace_file(task):
+    """ pool worker, trace one image file """
+    file, cache_path, params = task
+    path = get_potrace_path(get_binary_image(file), cache_path=cache_path, **params)
+    if not isinstance(path, TracedPath):
+        path = TracedPath.from_potrace(path)
+    return file, path.arrays()
+
+
+def trace_images(path, extensions='jpg jpeg png bmp', cache_path=None, workers=4, recursive=False, **params):
+    """ trace the binary images of a folder in a process pool
+
+    Args:
+        path (str): images folder
+        extensions (str, optional): image file extensions. Defaults to 'jpg jpeg png bmp'.
+        cache_path (str, optional): folder to cache traced paths. Defaults to None.
+        workers (int, optional): processes to trace images. Defaults to 4.
+        recursive (bool, optional): trace the sub folders. Defaults to False.
+        params: potrace trace parameters
+
+    Returns:
+        dict: image file -> TracedPath
+    """
+    tasks = [(file, cache_path, params) for file in traverse_files(path, extensions, recursive)]
+    if workers <= 1:
+        results = map(_trace_file, tasks)
+        return {file: TracedPath.from_arrays(arrays) for file, arrays in results}
+    with Pool(workers) as pool:
+        return {file: TracedPath.from_arrays(arrays) for file, arrays in pool.imap(_trace_file, tasks)}
 
 
 def transform_points(de_points, zoom_x=0.5, zoom_y=0.5, to_point=(0, 0)):
-    de_points = [[i.x, i.y] for i in de_points]
-    de_points = np.asarray(de_points)
-    # print('de_points=', de_points, de_points.shape)
-
-    # start to translate
-    x, y = split_points(de_points)
-    x, y = zoom_non_pts_xy(x, y, zoom_x, zoom_y)
-    x, y = translation_pts_xy(x, y, to_point)
-    return combine_xy(x, y)
-
-
-def path_potrace_jagged(path):
-    parts = []
-    for curve in path:
-        parts.append("M")
-
-        points = curve.decomposition_points
-        # print('points=',  points, len(points))
-        for point in points:
-            parts.append(f" {point.x},{point.y}")
-
-        parts.append("z")
-    return "".join(parts)
-
-
-def path_potrace_jagged_trans(path, zoom_x, zoom_y, to_point):
-    parts = []
-    for curve in path:
-        parts.append("M")
-
-        points = curve.decomposition_points
-        # print('points=',  points, len(points))
-        points = transform_points(points, zoom_x, zoom_y, to_point)
-        # print('points, pts.shape=', points, points.shape)
-        for point in points:
-            parts.append(f" {point[0]},{point[1]}")
-
-        parts.append("z")
-    return "".join(parts)
-
-
-def path_potrace(path):
-    # print('len(path)=', len(path))
-    parts = []
-    for curve in path:
-        pt = curve.start_point
-        parts.append(f"M{pt.x},{pt.y}")
-        for segment in curve.segments:
-            if segment.is_corner:
-                a = segment.c
-                parts.append(f"L{a.x},{a.y}")
-                b = segment.end_point
-                parts.append(f"L{b.x},{b.y}")
-            else:
-                a = segment.c1
-                b = segment.c2
-                c = segment.end_point
-                parts.append(f"C{a.x},{a.y} {b.x},{b.y} {c.x},{c.y}")
-        parts.append("z")
-
-    return "".join(parts)
+    """ zoom and translate N*2 points, or potrace points """
+    if not isinstance(de_points, np.ndarray):
+        de_points = np.array([[i.x, i.y] for i in de_points])
+    return de_points * np.array([zoom_x, zoom_y]) + np.asarray(to_point)
+
+
+PATH_TEMPLATES = {'start': 'M%s,%s', 'corner': ('', 'L%s,%s', 'L%s,%s'),
+                  'bezier': ('C%s,%s', ' %s,%s', ' %s,%s'), 'end': 'z'}  # path_potrace format
+JAGGED_TEMPLATES = {'start': 'M %s,%s', 'point': ' %s,%s', 'end': 'z'}  # path_potrace_jagged format
+PATH_COMMANDS = {'start': 'M', 'corner': ('', 'L', 'L'), 'bezier': ('C', 'c', 'c'), 'end': 'z'}  # path_data commands
+JAGGED_COMMANDS = {'start': 'M', 'point': 'L', 'end': 'z'}
+
+
+def potrace_tokens(path, templates, jagged=False):
+    """ pack the points of a potrace path into one N*2 array with a template per point
+
+    Args:
+        path (Path or TracedPath): potrace path
+        templates (dict): 'start', 'end' of every curve, 'corner'/'bezier' templates of the 3 segment
+            points (an empty corner template skips the point), or 'point' of the jagged outline points
+        jagged (bool, optional): use the decomposition (outline) points. Defaults to False.
+
+    Returns:
+        tuple: (templates list, N*2 points)
+    """
+    if not isinstance(path, TracedPath):
+        path = TracedPath.from_potrace(path)
+    if len(path) == 0:
+        return [], np.zeros((0, 2))
+
+    if jagged:
+        values, index = path.decomposition, path.point_index
+        tokens = np.full(len(values), templates['point'], dtype=object)
+        tokens[index[:-1]] = templates['start']
+    else:
+        corner = np.array(templates['corner'], dtype=object)
+        bezier = np.array(templates['bezier'], dtype=object)
+        tokens = np.where(path.corners[:, None], corner, bezier)
+        keep = tokens != ''
+        first = np.cumsum(keep.sum(axis=1))[path.segment_index[:-1]] - keep[path.segment_index[:-1]].sum(axis=1)
+        start_points = path.points[path.segment_index[1:] - 1, 2]  # end point of the last segment
+        values = np.insert(path.points[keep], first, start_points, axis=0)
+        tokens = np.insert(tokens[keep], first, templates['start'])
+        index = np.append(first + np.arange(len(first)), len(tokens))
+
+    tokens[index[1:-1]] = templates['end'] + tokens[index[1:-1]]  # curve end before the next start
+    tokens[-1] = tokens[-1] + templates['end']
+    return tokens.tolist(), values
+
+
+def _trim_zeros(d):
+    """ remove the trailing zeros of fixed precision numbers """
+    return re.sub(r'\.(?!\d)', '', re.sub(r'(\.\d*?)0+(?!\d)', r'\1', d))
+
+
+def format_path_tokens(tokens, values, precision=None):
+    """ format path tokens in bulk, every token template has the %s of its x, y
+
+    Args:
+        tokens (list): templates of the points
+        values (array): N*2 points
+        precision (int, optional): decimals of the coordinates, trailing zeros are removed,
+            None keeps the full precision of the values. Defaults to None.
+    """
+    template = ''.join(tokens)
+    if precision is not None:
+        template = template.replace('%s', f'%.{precision}f')
+    d = template % tuple(np.asarray(values).ravel().tolist())
+    return d if precision is None else _trim_zeros(d)
+
+
+def potrace_path_d(path, precision=None, zoom_x=1, zoom_y=1, to_point=(0, 0), jagged=False,  # pylint: disable=too-many-arguments
+                   tolerance=None, method='rdp', max_error=None):
+    """ svg path d of a potrace path, points are transformed and formatted in bulk
+
+    Args:
+        path (Path or TracedPath): potrace path
+        precision (int, optional): decimals of the coordinates, None keeps the full precision. Defaults to None.
+        zoom_x (float, optional): x zoom. Defaults to 1.
+        zoom_y (float, optional): y zoom. Defaults to 1.
+        to_point (tuple, optional): translation after the zoom. Defaults to (0, 0).
+        jagged (bool, optional): polygons of the decomposition points instead of curves. Defaults to False.
+        tolerance (float, optional): simplify the jagged polygons within tolerance output units. Defaults to None.
+        method (str, optional): simplification method, 'rdp' or 'vw'. Defaults to 'rdp'.
+        max_error (float, optional): compact relative path data with the fewest decimals within max_error,
+            see svg.path_data, precision then fixes the decimals. Defaults to None.
+    """
+    if jagged and tolerance:
+        if not isinstance(path, TracedPath):
+            path = TracedPath.from_potrace(path)
+        path = path.simplified(tolerance, method, zoom_x, zoom_y)
+    if max_error is not None:
+        templates = JAGGED_COMMANDS if jagged else PATH_COMMANDS
+    else:
+        templates = JAGGED_TEMPLATES if jagged else PATH_TEMPLATES
+    tokens, values = potrace_tokens(path, templates, jagged)
+    if (zoom_x, zoom_y) != (1, 1) or tuple(to_point) != (0, 0):
+        values = transform_points(values, zoom_x, zoom_y, to_point)
+    if max_error is not None:
+        return path_data(tokens, values, max_error, precision)
+    return format_path_tokens(tokens, values, precision)
+
+
+def path_potrace_jagged(path, precision=None, tolerance=None, max_error=None):
+    return potrace_path_d(path, precision, jagged=True, tolerance=tolerance, max_error=max_error)
+
+
+def path_potrace_jagged_trans(path, zoom_x, zoom_y, to_point, precision=None, tolerance=None, max_error=None):
+    return potrace_path_d(path, precision, zoom_x, zoom_y, to_point, jagged=True, tolerance=tolerance, max_error=max_error)
+
+
+def path_potrace(path, precision=None, max_error=None):
+    return potrace_path_d(path, precision, max_error=max_error)
 
 
 def get_binary_image(file, show=False, binary=True):
@@ -361,7 +793,7 @@ def image_svg_path(file, dst_file):
 
     paths = get_potrace_path(image)
     # path = path_potrace(paths)
-    path = path_potrace_jagged(paths)
+    path = path_potrace_jagged(paths, max_error=0.05)
     print('len(path)=', len(path))
     fill_color = random_color_hsv()  # 'black'
     svg.draw(draw_path(path, stroke_width=1.8, color='none',
@@ -384,7 +816,7 @@ def image_svg_path2(file, dst_file):
         for j in range(N):
             to_point = (i * W / N, j * H / N)
             path = path_potrace_jagged_trans(
-                paths, zoom_x=zoom, zoom_y=zoom, to_point=to_point)
+                paths, zoom_x=zoom, zoom_y=zoom, to_point=to_point, max_error=0.05)
             fill_color = random_color()
             svg.draw(draw_path(path, color='none',
                      fill_color=fill_color, fill_rule='evenodd'))
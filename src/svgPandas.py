@@ -7,6 +7,7 @@ Description: SVG show pandas data
 """""""""""""""""""""""""""""""""""""""""""""""""""""
 
 from enum import Enum
+from functools import partial
 import numpy as np
 import pandas as pd
 from svg.basic import add_style, get_styles, draw_any, color_fader, clip_float
@@ -129,7 +130,8 @@ def plotTable(svg, node, df, style=TableContentStyle.TEXT, offsetX=5, offsetY=5)
                     r = clip_float(r)
                     x = clip_float(x)
                     y = clip_float(y)
-                    drawSmileSVGNode(svg, g, radius=r, offsetX=x, offsetY=y)
+                    name = svg.define_symbol(f'smile{r}', partial(drawSmileSVGNode, radius=r))
+                    svg.use(name, x, y, node=g)
                     # svg.draw_node(node, draw_any('rect', df.iloc[i,j], **any_dict))
                     # svg.draw_node(node, draw_any('circle', cx=x,cy=y,r=2,fill='red'))
                 else:
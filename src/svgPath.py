@@ -12,6 +12,7 @@ from svg.file import SVGFileV2
 from svg.basic import clip_float, random_color_hsv
 from svg.basic import draw_path, draw_text, add_style, get_styles
 from svg.basic import random_points, transfrom_dict
+from svg.path_data import polyline_data
 from svg.geo_transformation import translation_pts_xy, rotation_pts, rotation_pts_xy_point
 from svg.geo_transformation import zoom_pts_xy_point, zoom_pts
 from svg.geo_transformation import translation_pts
@@ -38,15 +39,8 @@ def split_string(src_str, delimiter=' ', length=24):
     return new_str
 
 
-def draw_points_svg(svg, ptX, ptY, close=False, stroke=0.6, color=None, fill_color='transparent'):
-    x = ptX[0]
-    y = ptY[0]
-    path = f'M {x:.1f} {y:.1f} L'
-    for x, y in zip(ptX[1:], ptY[1:]):
-        path = path + ' ' + str(clip_float(x)) + ' ' + str(clip_float(y))
-
-    if close:
-        path += ' Z'
+def draw_points_svg(svg, ptX, ptY, close=False, stroke=0.6, color=None, fill_color='transparent', max_error=0.05):
+    path = polyline_data(np.column_stack((ptX, ptY)), close, max_error)
 
     # color = color or random_color_hsv()
     return svg.draw(draw_path(path, stroke_width=stroke, color=color, fill_color=fill_color))
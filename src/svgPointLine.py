@@ -12,11 +12,13 @@ import numpy as np
 from scipy.spatial import Delaunay, Voronoi
 from svg.file import SVGFileV2
 from svg.basic import clip_float, draw_any, draw_line, random_color, color_fader
-from svg.basic import random_color_hsv, clip_floats
+from svg.basic import random_color_hsv
 from svg.basic import draw_circle, rainbow_colors, draw_path, draw_polygon, draw_text
-from svg.basic import draw_ring, draw_only_circle
+from svg.basic import draw_ring
 from svg.basic import random_points, uniform_random_points, line_style, get_styles
-from svg.basic import draw_only_line, is_element_name, style_content
+from svg.basic import is_element_name, style_content
+from svg.simplify import simplify
+from svg.path_data import polyline_data
 from svg.geo_transformation import rotation_pts_xy_point, translation_pts
 from svg.geo_math import points_on_triangle, get_regular_ngons
 from graph.graphPoints import GraphPoints
@@ -46,16 +48,8 @@ def drawlinePoints_style(svg, pts, node=None, stroke_width=0.5, color=None, dash
     style_dict = line_style(color=color or random_color(), stroke_width=stroke_width,
                             stroke_dasharray=dash)
 
-    svg.add_svg_style('line', style_dict)
-
     # print('pts: ', pts)
-    for _, pt in enumerate(pts):
-        x1, y1, x2, y2 = pt
-        x1 = clip_float(x1)
-        y1 = clip_float(y1)
-        x2 = clip_float(x2)
-        y2 = clip_float(y2)
-        svg.draw_node(node, draw_only_line(x1, y1, x2, y2))
+    svg.add_lines(pts, node=node, cls=svg.style_class(style_dict))
 
 
 def drawlinePointsContinus(svg, pts, stroke_width=0.5, color=None, stroke_widths=None):
@@ -135,10 +129,9 @@ def drawPointsCircle_style(svg, pts, node=None, r=2, color='black', style_class=
 
         svg.add_style_node(style_content(style_name, get_styles(style_dict)))
 
-    for pt in pts:
-        x = clip_float(pt[0])
-        y = clip_float(pt[1])
-        svg.draw_node(node, draw_only_circle(x, y, class_name=style_class))
+    if style_class is None or is_element_name(style_class):
+        style_class = None
+    svg.add_circles(pts, node=node, cls=style_class)
 
 
 def drawPointsCircleFadeColor(svg, pts, r=2):
@@ -153,17 +146,11 @@ def drawPointsCircleFadeColor(svg, pts, r=2):
         svg.draw(draw_circle(x, y, radius=r, color=color))
 
 
-def drawPathContinuPoints(svg, pts, stroke_width=0.5, color=None):
-    path = 'M '
-    last = None
-    for i in pts:
-        t = clip_floats(i)
-        # print('pts=', pts[i], 't=', t)
-        if np.array_equal(last, t):
-            continue
-        path = path + ' ' + str(t[0]) + ' ' + str(t[1])
-        last = t
-
+def drawPathContinuPoints(svg, pts, stroke_width=0.5, color=None, tolerance=None, method='rdp', max_error=0.05):
+    """ draw points as one compact path, tolerance simplifies the points with method 'rdp' or 'vw' """
+    if tolerance:
+        pts = simplify(np.asarray(pts), tolerance, method)
+    path = polyline_data(pts, max_error=max_error)
     svg.draw(draw_path(path, stroke_width=stroke_width, color=color or random_color()))
 
 
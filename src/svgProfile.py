@@ -15,9 +15,10 @@ from svgImageMask import get_binary_image, get_potrace_path, path_potrace_jagged
 class ProfileStyleSimple:
     """Profile svg class"""
 
-    def __init__(self, svg, data_dict=None):
+    def __init__(self, svg, data_dict=None, cache_path=None):
         self.svg = svg
         self.data_dict = data_dict
+        self.cache_path = cache_path  # folder to cache traced portraits
         self.draw()
 
     def _prepare_svg(self):  # style css define
@@ -96,10 +97,10 @@ class ProfileStyleSimple:
         image = get_binary_image(file, binary=True)
         W = image.shape[1]
         H = image.shape[0]
-        paths = get_potrace_path(image)
+        paths = get_potrace_path(image, cache_path=self.cache_path)
 
         path = path_potrace_jagged_trans(paths, zoom_x=width / W, zoom_y=height / H,
-                                         to_point=to_point)
+                                         to_point=to_point, max_error=0.05)
         # print('len(path)=', len(path))
         self.svg.draw_node(node, draw_path(path, color='none', fill_color='black',
                                            fill_rule='evenodd'))
@@ -7,7 +7,10 @@
 # Copyright (c) 2020-2021, Steven Huang
 # License: MIT License
 """
+import os
 import math
+import struct
+from collections import namedtuple
 import numpy as np
 from svg.file import SVGFileV2
 from svgPointLine import drawlinePoints
@@ -17,45 +20,214 @@ from common_path import join_path
 
 # signed 16bit pcm, little-endian 1channel, sample rate 8000HZ
 
+SoundFormat = namedtuple('SoundFormat', 'channels sample_rate dtype sample_width offset frames')
+WAV_PCM, WAV_FLOAT, WAV_EXTENSIBLE = 1, 3, 0xFFFE
+WAV_DTYPES = {(WAV_PCM, 1): 'u1', (WAV_PCM, 2): '<i2', (WAV_PCM, 3): '<i4', (WAV_PCM, 4): '<i4',
+              (WAV_FLOAT, 4): '<f4', (WAV_FLOAT, 8): '<f8'}  # 24 bits samples are mapped as 32 bits, see mapSoundData
 
-def readSoundData(file, N=-1):
-    """ read sound pcm file """
-    data = np.memmap(file, dtype=np.short, mode='r')
+
+def readWavFormat(file):
+    """ parse the RIFF chunks of a wav file up to its data chunk """
+    with open(file, 'rb') as f:
+        riff, _, wave = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave != b'WAVE':
+            raise ValueError(f'Not a wav file: {file}')
+        tag = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f'No data chunk in wav file: {file}')
+            chunk_id, size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                body = f.read(size + size % 2)
+                tag, channels, sample_rate, _, block_align, _ = struct.unpack('<HHIIHH', body[:16])
+                if tag == WAV_EXTENSIBLE and size >= 26:
+                    tag = struct.unpack('<H', body[24:26])[0]  # first 2 bytes of the sub format guid
+                sample_width = block_align // channels
+            elif chunk_id == b'data':
+                if tag is None:
+                    raise ValueError(f'No fmt chunk before the data chunk of wav file: {file}')
+                if (tag, sample_width) not in WAV_DTYPES:
+                    raise ValueError(f'Unsupported wav format {tag}, {sample_width * 8} bits: {file}')
+                offset = f.tell()
+                size = min(size, os.path.getsize(file) - offset)  # unfinished recordings
+                return SoundFormat(channels, sample_rate, np.dtype(WAV_DTYPES[(tag, sample_width)]),
+                                   sample_width, offset, size // (sample_width * channels))
+            else:
+                f.seek(size + size % 2, os.SEEK_CUR)
+
+
+def readSoundFormat(file, channels=1, dtype=np.short, sample_rate=8000, offset=0):
+    """ sound format of a wav file from its header, or of a headerless pcm file from the arguments """
+    if os.path.splitext(file)[1].lower() == '.wav':
+        return readWavFormat(file)
+    dtype = np.dtype(dtype)
+    frames = (os.path.getsize(file) - offset) // (dtype.itemsize * channels)
+    return SoundFormat(channels, sample_rate, dtype, dtype.itemsize, offset, frames)
+
+
+def mapSoundData(file, fmt):
+    """ memory-map the samples of a sound file as a frames*channels array, nothing is read into memory,
+    24 bits samples are viewed in place as 32 bits samples whose lowest byte is the byte before
+    the sample, below the 24 bits resolution
+    """
+    if fmt.sample_width == fmt.dtype.itemsize:
+        return np.memmap(file, dtype=fmt.dtype, mode='r', offset=fmt.offset, shape=(fmt.frames, fmt.channels))
+
+    buffer = np.memmap(file, dtype=np.uint8, mode='r')
+    shift = fmt.dtype.itemsize - fmt.sample_width  # the sample is in the high bytes of the wider view
+    return np.ndarray((fmt.frames, fmt.channels), dtype=fmt.dtype, buffer=buffer, offset=fmt.offset - shift,
+                      strides=(fmt.sample_width * fmt.channels, fmt.sample_width))
+
+
+def readSoundData(file, N=-1, channels=1, dtype=np.short):
+    """ read sound wav or pcm file, mono data is a 1D array, otherwise frames*channels """
+    fmt = readSoundFormat(file, channels, dtype)
+    data = mapSoundData(file, fmt)
+    if fmt.channels == 1:
+        data = data[:, 0]
     data = data[:N]
-    print(type(data), data.shape, data)
-    print('min,max=', np.min(data), np.max(data))
+    print(type(data), data.shape, fmt)
     # plt.plot(data)
     # plt.show()
     return data
 
 
-def drawSoundGrapic(svg, data, seperate_lines=False, rotate=False, x_scale=55,R=120):
-    """ draw sound wave data """
+def sound_chunks(data, chunk_size=1 << 20):
+    """ iterate (start, samples) chunks of long (memory-mapped) sound data """
+    for start in range(0, len(data), chunk_size):
+        yield start, data[start:start + chunk_size]
+
+
+def sample_scale(dtype):
+    """ (offset, unit) of the samples, a 16 bits sample unit of 400 is one svg unit """
+    dtype = np.dtype(dtype)
+    if dtype.kind == 'f':
+        return 0, 400 / 32768
+    bits = dtype.itemsize * 8
+    offset = 2 ** (bits - 1) if dtype.kind == 'u' else 0
+    return offset, 400 * 2 ** (bits - 16) if bits >= 16 else 400 / 2 ** (16 - bits)
+
+
+def sound_y(data, center):
+    """ svg y of the samples around the center line """
+    offset, unit = sample_scale(data.dtype)
+    if offset:
+        data = data.astype(np.int64) - offset
+    return center - data // unit
+
+
+def sound_envelope(data, bucket_size, chunk_size=1 << 20):
+    """ min/max envelope of sound data, vectorized over the chunks of the (memory-mapped) samples
+
+    Args:
+        data (array): sound samples
+        bucket_size (int): samples of every bucket, a bucket also covers the first
+            sample of the next one so the envelopes join up
+        chunk_size (int, optional): samples read at once, rounded to whole buckets. Defaults to 1 << 20.
+
+    Returns:
+        tuple: (bucket start indices, minimums, maximums)
+    """
+    chunk_size = max(1, chunk_size // bucket_size) * bucket_size
+    mins, maxs = [], []
+    for _, chunk in sound_chunks(data, chunk_size):
+        starts = np.arange(0, len(chunk), bucket_size)
+        mins.append(np.asarray(np.minimum.reduceat(chunk, starts)))
+        maxs.append(np.asarray(np.maximum.reduceat(chunk, starts)))
+    starts = np.arange(0, len(data), bucket_size)
+    mins, maxs = np.concatenate(mins), np.concatenate(maxs)
+    following = data[starts[1:]]
+    mins[:-1] = np.minimum(mins[:-1], following)
+    maxs[:-1] = np.maximum(maxs[:-1], following)
+    return starts, mins, maxs
+
+
+def drawSoundEnvelope(svg, data, seperate_lines=False, x_scale=55, tolerance=None, center=None, color=None):
+    """ draw sound wave data decimated to one min/max bucket per output pixel """
+    H, _ = svg.get_size()
+    center = H // 2 if center is None else center
+    starts, mins, maxs = sound_envelope(data, max(1, round(x_scale)))
+    x = starts / x_scale
+    lows, highs = sound_y(mins, center), sound_y(maxs, center)
+    print('buckets, min, max=', len(starts), np.min(highs), np.max(lows))
+
+    if seperate_lines:
+        drawlinePoints(svg, np.column_stack((x, lows, x, highs)).tolist(), color=color, styles_opt=False)
+    else:
+        odd = np.arange(len(starts)) % 2 == 1  # zigzag, low to high then high to low
+        y = np.column_stack((np.where(odd, highs, lows), np.where(odd, lows, highs))).ravel()
+        drawPathContinuPoints(svg, np.column_stack((np.repeat(x, 2), y)), stroke_width=0.2, color=color,
+                              tolerance=tolerance)
+
+
+def polar_points(radius, angles, scale, center):
+    """ N*2 points of radius*scale at the angles around the center """
+    r = radius * scale
+    return np.column_stack((center[0] + r * np.cos(angles), center[1] + r * np.sin(angles)))
+
+
+def drawSoundPolarEnvelope(svg, data, R=120, tolerance=None, center=None, color=None):
+    """ draw rotated sound wave data decimated to min/max buckets of about one svg unit of the circle """
     H, W = svg.get_size()
-    cx, cy = W // 2, H // 2
+    center = H // 2 if center is None else center
+    starts, mins, maxs = sound_envelope(data, max(1, math.ceil(len(data) / (2 * np.pi * R))))
+    a, b = sound_y(mins, center) - center, sound_y(maxs, center) - center
+    lows, highs = np.minimum(a, b), np.maximum(a, b)
+    peak = np.max(highs)
+    inner = np.where((lows <= 0) & (highs >= 0), 0, np.minimum(np.abs(lows), np.abs(highs)))
+    outer = np.maximum(np.abs(lows), np.abs(highs))
+    print('buckets, min, max=', len(starts), np.min(lows), peak)
+
+    odd = np.arange(len(starts)) % 2 == 1  # zigzag, inner to outer then outer to inner
+    radius = np.column_stack((np.where(odd, outer, inner), np.where(odd, inner, outer))).ravel()
+    angles = np.repeat(starts * 2 * np.pi / len(data), 2)
+    pts = polar_points(radius, angles, R / peak, (W // 2, H // 2))
+    drawPathContinuPoints(svg, pts, stroke_width=0.2, color=color, tolerance=tolerance)
+
+
+def drawSoundGrapic(svg, data, seperate_lines=False, rotate=False, x_scale=55,R=120, tolerance=None, decimate=False,  # pylint: disable=too-many-arguments
+                    per_channel=False, center=None, color=None):
+    """ draw sound wave data, tolerance simplifies the continuous path, in svg units,
+    decimate draws the min/max envelope of every output pixel instead of every sample,
+    or of about every svg unit of the circle when rotated,
+    the channels of frames*channels data are drawn overlapped, or in bands with per_channel
+    """
+    H, W = svg.get_size()
+    if data.ndim == 2:
+        channels = data.shape[1]
+        for c in range(channels):
+            band_center = int((c + 0.5) * H / channels) if per_channel else center
+            drawSoundGrapic(svg, data[:, c], seperate_lines, rotate, x_scale, R, tolerance, decimate,
+                            center=band_center, color=color)
+        return
+
+    center = H // 2 if center is None else center
+    if decimate:
+        if rotate:
+            drawSoundPolarEnvelope(svg, data, R, tolerance, center, color)
+        else:
+            drawSoundEnvelope(svg, data, seperate_lines, x_scale, tolerance, center, color)
+        return
 
-    data = H // 2 - data // 400  # shrink sound value into a range that svg can show
+    data = np.asarray(sound_y(data, center))  # shrink sound value into a range that svg can show
     print('data, min, max=', data, np.min(data), np.max(data))
-    pts = []
+    x = np.arange(len(data)) / x_scale
 
     if seperate_lines:
-        for i in range(len(data) - 1):
-            pts.append((i / x_scale, data[i], (i + 1) / x_scale, data[i + 1]))
+        xs, ys = x.tolist(), data.tolist()
+        pts = list(zip(xs[:-1], ys[:-1], xs[1:], ys[1:]))
         # drawlinePoints(svg, pts)  # style 1
-        drawlinePoints(svg, pts, styles_opt=False)
+        drawlinePoints(svg, pts, color=color, styles_opt=False)
     else:
-        totlal = len(data)
         if not rotate:
-            for i in range(totlal):
-                pts.append((i / x_scale, data[i]))
+            pts = np.column_stack((x, data))
         else:
-            data = data - H // 2
-            for i in range(totlal):
-                angle = i * 2 * np.pi / totlal
-                r = R * math.fabs(data[i]) / np.max(data)
-                pts.append((cx + r * math.cos(angle), cy + r * math.sin(angle)))
+            data = data - center
+            angles = np.arange(len(data)) * 2 * np.pi / len(data)
+            pts = polar_points(np.abs(data), angles, R / np.max(data), (W // 2, H // 2))
 
-        drawPathContinuPoints(svg, pts, stroke_width=0.2)  # style 2
+        drawPathContinuPoints(svg, pts, stroke_width=0.2, color=color, tolerance=tolerance)  # style 2
 
 
 def main():
@@ -6,23 +6,70 @@
 Description: Simulate drawing pixel images using only svg line elements
 Inspired by: https://www.youtube.com/watch?v=WGccIFf6MF8
 """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+import os
+import hashlib
 from itertools import combinations
 from dataclasses import dataclass, field
+from contextlib import nullcontext
+from multiprocessing import Pool, shared_memory
 import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import LinearOperator, lsqr
 from common import IMAGE_OUTPUT_PATH
 from common_path import join_path
 from svg.file import SVGFileV2
-from svg.geo_math import get_regular_ngons, distance_pt_line, distance_array
+from svg.geo_math import get_regular_ngons, distance_pts_lines, distance_array
 from svg.basic import draw_any, draw_ring, draw_circle, draw_text, draw_rect
 from svg.basic import draw_only_line, line_style
 from svg.geo_transformation import translation_pts
 from svg.progress_bar import SimpleProgressBar
+from svg.disk_cache import DiskCache
 from svgPointLine import drawPointsCircle_style, drawlinePoints
 from svgImageMask import showimage, resizeImg, get_binary_image, rotateImg, loadGrayImg
 
+STRING_MATRIX_VERSION = 1  # bump when the matrix calculation changes to invalidate cached matrices
+
+
+@dataclass(slots=True)
+class StringMatrix:
+    """ sparse string coverage matrix, (cells, strings) = far - deficit
+
+    Cells far away from a string have the same value far, so only the deficit of
+    the cells close to each string is stored, as a scipy CSC matrix.
+    """
+    far: float
+    deficit: sparse.csc_matrix
+
+    @property
+    def shape(self):
+        return self.deficit.shape
+
+    def dot(self, c):
+        """ matrix @ c """
+        return self.far * np.sum(c) - self.deficit.dot(c)
+
+    def column(self, i):
+        """ dense column of string i """
+        return self.far - self.deficit[:, i].toarray().ravel()
+
+    def max_columns(self, columns):
+        """ max of the selected columns of each cell """
+        if len(columns) == 0:
+            return np.zeros(self.shape[0])
+        return self.far - self.deficit[:, columns].min(axis=1).toarray().ravel()
+
+    def linear_operator(self):
+        """ scipy LinearOperator of the matrix """
+        return LinearOperator(self.shape, matvec=self.dot, rmatvec=lambda y: self.far * np.sum(y) - self.deficit.T.dot(y),
+                              dtype=np.float64)
+
 
 def pseudo_inverse(matrix, b):
-    """ https://en.wikipedia.org/wiki/Moore%E2%80%93Penrose_inverse """
+    """ https://en.wikipedia.org/wiki/Moore%E2%80%93Penrose_inverse
+    StringMatrix is solved by LSQR, it converges to the minimum norm least squares solution pinv(matrix).dot(b)
+    """
+    if isinstance(matrix, StringMatrix):
+        return lsqr(matrix.linear_operator(), b, atol=1e-10, btol=1e-10, iter_lim=10 * matrix.shape[1])[0]
     return np.linalg.pinv(matrix).dot(b)
 
 
@@ -44,6 +91,7 @@ def test_pseudo_inverse():
 @dataclass(slots=True)
 class QuantumizeGrid:
     """ Cardioid class"""
+    # pylint: disable=too-many-instance-attributes
     center: tuple
     radius: float
     quantum_divisions: int
@@ -61,6 +109,11 @@ class QuantumizeGrid:
     search_batch: int = 1
     initial_strings: bool = False
     cumulative: bool = True
+    continuous: bool = False  # one continuous thread from nail to nail
+    min_nail_skip: int = 1  # minimum nails between the two ends of a string
+    nail_lines: list[np.array] = field(default_factory=list)  # nail -> line indexes of the nail
+    string_path: list[int] = field(default_factory=list)  # nails of the continuous thread
+    workers: int = 1  # processes of greedy search
 
     """ quantum """
     grid_inter: float = 0
@@ -71,10 +124,19 @@ class QuantumizeGrid:
     grid_rects: list[tuple] = field(default_factory=list)
     grid_rects_center: list[tuple] = field(default_factory=list)
     grid_rect_matrix: np.array = None
-    grid_matrix_all: np.array = None
+    grid_matrix_all: StringMatrix = None
+    matrix_memory: int = 256  # MB, memory cap of line blocks in matrix calculation
 
     string_list: list[tuple] = field(default_factory=list)  # final enabled string list
 
+    """ checkpoint """
+    checkpoint_file: str = None  # .npz file to save the solver state periodically
+    checkpoint_every: int = 20  # strings between two checkpoints
+    resume_from: str = None  # checkpoint .npz file to resume the solver from
+    cache_path: str = None  # folder to cache the coverage matrix between runs
+    cache_size: int = 1024  # maximum size of the matrix cache, MB, least recently used matrices are evicted
+    checkpoint_strings: int = 0  # string number of the last checkpoint
+
     def __post_init__(self):
         self._calculate()
 
@@ -109,6 +171,12 @@ class QuantumizeGrid:
         self.circle_lines = np.round(self.circle_lines, decimals=4)
         # print('lines_index=', self.circle_lines_index)
 
+        index = np.asarray(self.circle_lines_index).reshape((-1, 2))
+        skip = np.abs(index[:, 0] - index[:, 1])
+        skip = np.minimum(skip, pts.shape[0] - skip)
+        valid = skip >= self.min_nail_skip
+        self.nail_lines = [np.flatnonzero(valid & np.any(index == i, axis=1)) for i in range(pts.shape[0])]
+
     def _calculate_quantum(self):
         """ quantum calculation """
         self.grid_inter = 2 * self.radius / self.quantum_divisions
@@ -155,42 +223,48 @@ class QuantumizeGrid:
         self.grid_rects_center = np.asarray(self.grid_rects_center)
 
     def _handle_line_matrix(self, m):
+        """ map distances (in diagonal_dis units) of cells to a string to cell values """
         m[m <= 1] = 0
         m[m >= 3] = 1
         m[m > 1] /= 3.0
 
-        eff = 0.12 / m.shape[0]
+        eff = 0.12 / self.quantum_divisions
         m *= (255 * eff)
-        return m.flatten()
+        return m
 
     def _calculate_rect_matrix(self):
-        """ line matrix """
+        """ line matrix, lines are calculated in blocks under matrix_memory(MB), only cells
+        close to a string are stored """
         self.grid_rect_matrix = np.zeros((self.quantum_divisions, self.quantum_divisions))
+        cache, key = self._matrix_cache()
+        cached = cache.load(key) if cache is not None else None
+        if cached is not None:
+            deficit = sparse.csc_matrix((cached['data'], cached['indices'], cached['indptr']), shape=cached['shape'])
+            self.grid_matrix_all = StringMatrix(float(cached['far']), deficit)
+            print('Load string\'s matrics from cache:', cache.file(key))
+            return
 
         line_num = len(self.circle_lines_index)
-        all_matrix = np.zeros((line_num, self.quantum_divisions * self.quantum_divisions))
+        cell_num = self.quantum_divisions * self.quantum_divisions
+        block = max(1, int(self.matrix_memory * 2**20 // (4 * 8 * cell_num)))
+        far = self._handle_line_matrix(np.array([3], dtype=np.float32))[0]  # cell value far from string
 
+        all_matrix = []
         progress = SimpleProgressBar(total=line_num, title='Calculate string\'s matrics')
-        for i, index in enumerate(self.circle_lines_index):
-            progress.update(i + 1)
-
-            tmp = np.ones((self.quantum_divisions, self.quantum_divisions), dtype=np.float32)
-            line = self.circle_lines[i]
-            start_pt = np.array([line[0], line[1]])
-            stop_pt = np.array([line[2], line[3]])
-
-            # print('line:', i, index, line)
-            for n, pt in enumerate(self.grid_rects_center):
-                dis = distance_pt_line(pt, start_pt, stop_pt)
-                # print(pt, 'dis=', dis)
-                # calculate center of quantum rect to string's distance
-                tmp[n // self.quantum_divisions][n % self.quantum_divisions] = dis / self.diagonal_dis
-                # break
-
-            all_matrix[i] = self._handle_line_matrix(tmp)
-            # print('\all_matrix[i]=', i, '\n', all_matrix[i], all_matrix[i].shape)
-            # print(i, all_matrix[i], all_matrix[i].shape, np.min(all_matrix[i]), np.max(all_matrix[i]))
-        self.grid_matrix_all = all_matrix.T
+        for start in range(0, line_num, block):
+            lines = self.circle_lines[start:start + block]
+            # calculate center of quantum rect to string's distance
+            dis = distance_pts_lines(self.grid_rects_center, lines, self.matrix_memory,
+                                     max_distance=3 * self.diagonal_dis)
+            dis.data = far - self._handle_line_matrix((dis.data / self.diagonal_dis).astype(np.float32))
+            dis.eliminate_zeros()
+            all_matrix.append(dis)
+            progress.update(start + lines.shape[0])
+        self.grid_matrix_all = StringMatrix(float(far), sparse.vstack(all_matrix).T.tocsc())
+        if cache is not None:
+            deficit = self.grid_matrix_all.deficit
+            cache.save(key, far=far, data=deficit.data, indices=deficit.indices,
+                       indptr=deficit.indptr, shape=deficit.shape)
         # print('grid_matrix_all.shape=', self.grid_matrix_all.shape)  # 45*64,  x(64*45), b(45x1), c: 64*1
 
     def _get_image(self):
@@ -225,73 +299,202 @@ class QuantumizeGrid:
         c[c <= min_c] = 0
         c[c > min_c] = 1
 
+    def _matrix_cache(self):
+        """ disk cache and key of the coverage matrix, the matrix only depends on the geometry """
+        if self.cache_path is None:
+            return None, None
+        cache = DiskCache(self.cache_path, self.cache_size, prefix='strings_matrix')
+        key = cache.key(version=STRING_MATRIX_VERSION, center=tuple(float(i) for i in self.center),
+                        radius=float(self.radius), circle_division=self.circle_division,
+                        quantum_divisions=self.quantum_divisions, circle_inner=bool(self.circle_inner))
+        return cache, key
+
+    def _parameters(self):
+        """ parameters a checkpoint belongs to """
+        return {'image_hash': hashlib.sha1(np.ascontiguousarray(self.img_target).tobytes()).hexdigest(),
+                'center': np.asarray(self.center, dtype=np.float64), 'radius': self.radius,
+                'circle_division': self.circle_division, 'quantum_divisions': self.quantum_divisions,
+                'circle_inner': self.circle_inner, 'cumulative': self.cumulative,
+                'continuous': self.continuous, 'min_nail_skip': self.min_nail_skip}
+
+    def _save_checkpoint(self, c, cur_d, path):
+        """ save solver state every checkpoint_every strings """
+        num = int(np.sum(c))
+        if self.checkpoint_file is None or num - self.checkpoint_strings < self.checkpoint_every:
+            return
+        self.checkpoint_strings = num
+        save_npz(self.checkpoint_file, c=c, rendered=cur_d, string_path=np.asarray(path, dtype=np.int64),
+                 **self._parameters())
+
+    def _load_checkpoint(self):
+        """ load solver state, the checkpoint must be saved from the same image and parameters """
+        with np.load(self.resume_from) as checkpoint:
+            for key, value in self._parameters().items():
+                if not np.array_equal(checkpoint[key], value):
+                    raise ValueError(f'Checkpoint {self.resume_from} mismatch: {key}={checkpoint[key]}, expected {value}')
+            print('Resume from checkpoint:', self.resume_from, 'string num=', int(np.sum(checkpoint['c'])))
+            return np.array(checkpoint['c']), np.array(checkpoint['rendered']), np.array(checkpoint['string_path']).astype(int).tolist()
+
     def _method_greedy_alg(self, matrix_all, target):
         """ greedy algorithm """
         c = np.zeros(matrix_all.shape[1])
-        if self.initial_strings:
+        cur_d, path = None, None
+        if self.resume_from is not None:
+            c, cur_d, path = self._load_checkpoint()
+        elif self.initial_strings:
             c = pseudo_inverse(matrix_all, target)
             self._set_top_c(c)
 
+        if self.continuous:
+            self.string_list, self.string_path = continuous_algorithm(matrix_all, target, c,
+                                                                      self.circle_lines_index,
+                                                                      self.nail_lines, cumulative=self.cumulative,
+                                                                      path=path, cur_d=cur_d,
+                                                                      checkpoint=self._save_checkpoint)
+            return
+
         self.string_list = greedy_algorithm(matrix_all, target, c,
                                             self.circle_lines_index,
-                                            self.search_batch, self.cumulative)
+                                            self.search_batch, self.cumulative, self.workers,
+                                            cur_d=cur_d, checkpoint=self._save_checkpoint)
 
     def _enabled_lines(self):
         # self._method_pseudo_inverse(self.grid_matrix_all, self.img_target) # method 1: pseudo inverse
         self._method_greedy_alg(self.grid_matrix_all, self.img_target)   # method 2: greedy algorithm
 
 
+def render_target(cur_c, matrix_all, cumulative=True):
+    """ rendered cells of current selected strings, not clipped """
+    if cumulative:
+        return matrix_all.dot(cur_c)
+    return matrix_all.max_columns(np.flatnonzero(cur_c == 1))
+
+
+def add_string(cur_d, matrix_all, index, cumulative=True):
+    """ rendered cells after adding string index """
+    if cumulative:
+        return cur_d + matrix_all.column(index)
+    return np.maximum(cur_d, matrix_all.column(index))
+
+
 def dis_target(cur_c, matrix_all, target, cumulative=True):
     """ calculate distance of current selected strings with target """
     # print('matrix_all: ', matrix_all, matrix_all.shape)
     # print('cur_c: ', cur_c, cur_c.shape)
     # print('target: ', target, target.shape)
 
-    if cumulative:
-        d = np.dot(matrix_all, cur_c)
-    else:
-        d = np.zeros(matrix_all.shape[0])
-        columns = [i for i, v in enumerate(cur_c) if v == 1]
-        # print('columns: ', columns)
-        if len(columns) != 0:
-            tmp = matrix_all[:, columns]
-            # print('tmp: ', tmp, tmp.shape)
-            # tmp = np.cumsum(tmp, axis=1)
-            # print('tmp cumsun: ', tmp, tmp.shape)
-            d = np.max(tmp, axis=1)
-            # print('d: ', d, d.shape)
-
+    d = render_target(cur_c, matrix_all, cumulative)
     d[d > 255] = 255
     # print('d: ', d, d.shape, np.min(d), np.max(d))
     return distance_array(d, target)
 
 
-def get_next_search_indexs(cur_c, pts_indexs, last_indexs=None):
-    res = []
-    if last_indexs is None:
-        for i in range(len(pts_indexs)):
-            res.append(i)
-    else:
-        last_index = last_indexs[0]
-        end_pt = pts_indexs[last_index][1]
-        for n, i in enumerate(pts_indexs):
-            if n != last_index and cur_c[n] == 0:
-                if end_pt in (i[0], i[1]):
-                    res.append(n)
-
-        if len(res) == 0:
-            indexs = [i for i, v in enumerate(cur_c) if v == 0]
-            if len(indexs) == 0:
-                return None
-            return get_next_search_indexs(cur_c, pts_indexs, indexs)
-    return res
-
-
-def get_best_index(cur_c, matrix_all, target, batch, cumulative, pts_indexs, last_indexs):
+def _string_error(d, t):
+    """ squared error of clipped cells """
+    return np.square(np.minimum(d, 255) - t)
+
+
+def _string_blend(d, v, cumulative=True):
+    """ blend string value v into rendered cells d """
+    return d + v if cumulative else np.maximum(d, v)
+
+
+def touched_delta(cur_d, target, far, data, indices, indptr, cumulative=True):
+    """ per string change of the squared distance on the cells close to the string,
+    data, indices, indptr are the CSC arrays of the deficit matrix """
+    rows = cur_d[indices]
+    t = target[indices]
+    touched = (_string_error(_string_blend(rows, far - data, cumulative), t)
+               - _string_error(_string_blend(rows, far, cumulative), t))
+    strings = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    return np.bincount(strings, weights=touched, minlength=len(indptr) - 1)
+
+
+def delta_target(cur_d, matrix_all, target, cumulative=True, indexs=None, scorer=None):
+    """ change of the squared distance to target for adding each string to the rendered cells cur_d,
+    all strings (or strings of indexs) are scored at once, only cells close to a string differ from the far value,
+    scorer(ParallelScorer) scores all strings in worker processes """
+    base = _string_error(_string_blend(cur_d, matrix_all.far, cumulative), target)  # cells far from the new string
+    delta = np.sum(base - _string_error(cur_d, target))
+    if scorer is not None:
+        return delta + scorer.touched_delta(cur_d)
+
+    deficit = matrix_all.deficit if indexs is None else matrix_all.deficit[:, indexs]
+    return delta + touched_delta(cur_d, target, matrix_all.far, deficit.data, deficit.indices, deficit.indptr, cumulative)
+
+
+_SCORER = {}  # shared arrays of a ParallelScorer worker process
+
+
+def _scorer_init(specs, far, cumulative):
+    """ attach worker process to the shared arrays """
+    for name, (shm_name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _SCORER[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        _SCORER[name + '_shm'] = shm
+    _SCORER['far'] = far
+    _SCORER['cumulative'] = cumulative
+
+
+def _scorer_delta(start, stop):
+    """ touched delta of strings [start, stop) in worker process """
+    indptr = _SCORER['indptr'][start:stop + 1]
+    lo, hi = indptr[0], indptr[-1]
+    return touched_delta(_SCORER['cur_d'], _SCORER['target'], _SCORER['far'], _SCORER['data'][lo:hi],
+                         _SCORER['indices'][lo:hi], indptr - lo, _SCORER['cumulative'])
+
+
+class ParallelScorer:
+    """ score strings in a process pool, deficit matrix, target and rendered cells are
+    shared memory, so only string ranges and results are passed between processes """
+
+    def __init__(self, matrix_all, target, cumulative=True, workers=2):
+        deficit = matrix_all.deficit
+        arrays = {'data': deficit.data, 'indices': deficit.indices, 'indptr': deficit.indptr,
+                  'target': target, 'cur_d': np.zeros(matrix_all.shape[0])}
+        self._shm = []
+        specs = {}
+        for name, arr in arrays.items():
+            shm = shared_memory.SharedMemory(create=True, size=max(1, arr.nbytes))
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[:] = arr
+            self._shm.append(shm)
+            specs[name] = (shm.name, arr.shape, arr.dtype.str)
+        self._cur_d = np.ndarray(matrix_all.shape[0], dtype=np.float64, buffer=self._shm[-1].buf)
+
+        bounds = np.linspace(0, matrix_all.shape[1], workers + 1).astype(int)
+        self._chunks = list(zip(bounds[:-1], bounds[1:]))
+        self._pool = Pool(workers, initializer=_scorer_init, initargs=(specs, matrix_all.far, cumulative))  # pylint: disable=consider-using-with
+
+    def touched_delta(self, cur_d):
+        """ touched delta of all strings """
+        self._cur_d[:] = cur_d
+        return np.concatenate(self._pool.starmap(_scorer_delta, self._chunks))
+
+    def close(self):
+        """ stop workers and free shared memory """
+        self._pool.close()
+        self._pool.join()
+        for shm in self._shm:
+            shm.close()
+            shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def get_next_search_indexs(cur_c, nail_lines, nail):
+    """ avaliable line indexs from the nail """
+    indexs = nail_lines[nail]
+    return indexs[cur_c[indexs] == 0]
+
+
+def get_best_index(cur_c, cur_d, matrix_all, target, batch, cumulative, pts_indexs, last_indexs, scorer=None):
     """ get new string index by finding the smallest distance to the target """
-    indexs = [i for i, v in enumerate(cur_c) if v == 0]  # avaliable indexs
-    # indexs = get_next_search_indexs(cur_c, pts_indexs, last_indexs)
-    cur_dis = dis_target(cur_c, matrix_all, target, cumulative)
+    indexs = np.flatnonzero(cur_c == 0)  # avaliable indexs
+    cur_dis = distance_array(np.minimum(cur_d, 255), target)
 
     cur_num = int(np.sum(cur_c))
     str_tmp = f'{cur_num}/{cur_c.shape[0]}/({round(cur_num * 100 /cur_c.shape[0], 2)}%)'
@@ -300,48 +503,86 @@ def get_best_index(cur_c, matrix_all, target, batch, cumulative, pts_indexs, las
     print('Cur strings:', str_tmp, ', cur distance:', np.round(cur_dis, 4), ', batch:', batch, ', last_indexs:', last_indexs)
     # print('cur_dis: ', cur_dis)
 
-    dis_dict = {}
-    progress = SimpleProgressBar(total=len(indexs), title='Search next best string')
-    for n, i in enumerate(indexs):
-        tmp_c = np.copy(cur_c)
-        tmp_c[i] = 1
-        # print('tmp_c=', tmp_c)
-        dis = dis_target(tmp_c, matrix_all, target, cumulative)
-        # print('\ni=', i, dis, cur_dis)
-        if dis < cur_dis:
-            dis_dict[i] = dis
-        progress.update(n + 1)
-
-    len_dis = len(dis_dict)
-    # print('len_dis=', len_dis)
-    if len_dis > 0:
-        batch = batch if batch < len_dis else len_dis
-        dis_dict = sorted(dis_dict.items(), key=lambda x: x[1], reverse=False)
-        # print('dis_dict=', dis_dict)
-        return [dis_dict[i][0] for i in range(batch)]
-        # return dis_dict[0][0]  # index # dis_dict[0][1]  distance
+    delta = delta_target(cur_d, matrix_all, target, cumulative, scorer=scorer)[indexs]
+    indexs, delta = indexs[delta < 0], delta[delta < 0]  # strings closer to the target
+    if len(indexs) > 0:
+        return indexs[np.argsort(delta, kind='stable')[:batch]].tolist()
     return None
 
 
-def greedy_algorithm(matrix_all, target, c, pts_indexs, batch=1, cumulative=False):
-    """ greedy algorithm to get the best strings to draw """
+def greedy_algorithm(matrix_all, target, c, pts_indexs, batch=1, cumulative=False, workers=1,
+                     cur_d=None, checkpoint=None):
+    """ greedy algorithm to get the best strings to draw, the rendered cells are updated
+    incrementally after each selection, strings are scored in workers processes when workers > 1,
+    checkpoint(c, cur_d, path) is called after each selection """
     print('matrix_all.shape=', matrix_all.shape, '[target vector/string numbers]')
     print('target=', target, target.shape)
     print('initial c: ', c, c.shape, 'string num=', int(np.sum(c)))
     print('batch=', batch)
     # print('pts_indexs=', pts_indexs)
 
+    target = target.astype(np.float64)
+    cur_d = render_target(c, matrix_all, cumulative) if cur_d is None else cur_d
     last_indexs = []
+    with ParallelScorer(matrix_all, target, cumulative, workers) if workers > 1 else nullcontext() as scorer:
+        while True:
+            indexs = get_best_index(c, cur_d, matrix_all, target, batch, cumulative, pts_indexs, last_indexs, scorer)
+            if indexs is None:
+                break
+            for i in indexs:
+                c[i] = 1
+                cur_d = add_string(cur_d, matrix_all, i, cumulative)
+            last_indexs = indexs
+            if checkpoint is not None:
+                checkpoint(c, cur_d, [])
+
+    print('\nfinal c: ', c, c.shape, 'string num=', int(np.sum(c)))
+    return c
+
+
+def continuous_algorithm(matrix_all, target, c, pts_indexs, nail_lines, start_nail=0, cumulative=False,
+                         path=None, cur_d=None, checkpoint=None):
+    """ greedy algorithm of one continuous thread, every step only searches the strings
+    from the current nail to the other nails, path resumes a thread from its last nail,
+    checkpoint(c, cur_d, path) is called after each selection """
+    path = [start_nail] if not path else list(path)
+    print('matrix_all.shape=', matrix_all.shape, '[target vector/string numbers]')
+    print('initial c: ', c, c.shape, 'string num=', int(np.sum(c)), 'start nail=', path[-1])
+
+    target = target.astype(np.float64)
+    cur_d = render_target(c, matrix_all, cumulative) if cur_d is None else cur_d
+    nail = path[-1]
     while True:
-        indexs = get_best_index(c, matrix_all, target, batch, cumulative, pts_indexs, last_indexs)
-        if indexs is None:
+        indexs = get_next_search_indexs(c, nail_lines, nail)
+        if len(indexs) == 0:
             break
-        for i in indexs:
-            c[i] = 1
-        last_indexs = indexs
+        delta = delta_target(cur_d, matrix_all, target, cumulative, indexs)
+        best = np.argmin(delta)
+        if delta[best] >= 0:
+            break
+
+        i = indexs[best]
+        c[i] = 1
+        cur_d = add_string(cur_d, matrix_all, i, cumulative)
+        nail = pts_indexs[i][1] if pts_indexs[i][0] == nail else pts_indexs[i][0]
+        path.append(nail)
+        print('Cur strings:', len(path) - 1, ', nail:', nail, ', cur distance:',
+              np.round(distance_array(np.minimum(cur_d, 255), target), 4), end='\r')
+        if checkpoint is not None:
+            checkpoint(c, cur_d, path)
 
     print('\nfinal c: ', c, c.shape, 'string num=', int(np.sum(c)))
-    return c
+    return c, path
+
+
+def save_npz(file, **kwargs):
+    """ save arrays to a compressed .npz file, the file is replaced only when it's completely written """
+    path = os.path.dirname(file)
+    if path:
+        os.makedirs(path, exist_ok=True)
+    tmp_file = file + '.tmp.npz'
+    np.savez_compressed(tmp_file, **kwargs)
+    os.replace(tmp_file, file)
 
 
 def draw_basic_circle_bg(svg, g, data: QuantumizeGrid):
@@ -365,9 +606,9 @@ def draw_quantum_color(svg, data: QuantumizeGrid):
         svg (_type_): _description_
         data (QuantumizeGrid): _description_
     """
-    print('all shape=', data.grid_matrix_all.T[0].shape)
+    print('all shape=', data.grid_matrix_all.column(0).shape)
 
-    data.grid_rect_matrix = data.grid_matrix_all.T[15]
+    data.grid_rect_matrix = data.grid_matrix_all.column(15)
     c_matrix = data.grid_rect_matrix.reshape((data.quantum_divisions, data.quantum_divisions))
 
     print('rect shape=', c_matrix)
@@ -419,7 +660,8 @@ def draw_strings(svg, data: QuantumizeGrid):
     print('string numbers: ', n)
 
 
-def draw_string_art(svg, src_img, r=90, circle_n=120, quantum_n=120, batch=1, initial=False, show=False):
+def draw_string_art(svg, src_img, r=90, circle_n=120, quantum_n=120, batch=1, initial=False, show=False,  # pylint: disable=too-many-arguments
+                    continuous=False, min_skip=1, workers=1, checkpoint=None, resume_from=None, cache_path=None):
     """ draw pixel image by using only strings
 
     Args:
@@ -430,15 +672,24 @@ def draw_string_art(svg, src_img, r=90, circle_n=120, quantum_n=120, batch=1, in
         quantum_n (int, optional): quantum numbers of the draw canvas
         batch(int, optional): Search batch size
         initial(bool, optional): Initialize some enabled string indexes to speed up searches
+        continuous(bool, optional): Draw one continuous thread from nail to nail
+        min_skip(int, optional): Minimum nails skipped by a string
+        workers(int, optional): Processes to search strings in parallel
+        checkpoint(str, optional): .npz file to save the search state periodically
+        resume_from(str, optional): .npz checkpoint file to resume the search from
+        cache_path(str, optional): Folder to cache the string matrix between runs
     """
     H, W = svg.get_size()
     cx, cy = W // 2, H // 2  # center point of svg
 
-    parameters = f'r:{r}, circle_n:{circle_n}, quantum_n:{quantum_n}, batch:{batch}, initial:{initial}, img:{src_img}'
+    parameters = (f'r:{r}, circle_n:{circle_n}, quantum_n:{quantum_n}, batch:{batch}, initial:{initial}, '
+                  f'continuous:{continuous}, min_skip:{min_skip}, img:{src_img}')
     svg.set_title('draw strings art:' + parameters)
     print('Start to draw strings:', parameters)
 
-    q_data = QuantumizeGrid((cx, cy), r, quantum_n, circle_n, pixel_image=src_img, search_batch=batch, initial_strings=initial, show_image=show)
+    q_data = QuantumizeGrid((cx, cy), r, quantum_n, circle_n, pixel_image=src_img, search_batch=batch, initial_strings=initial,
+                            show_image=show, continuous=continuous, min_nail_skip=min_skip, workers=workers,
+                            checkpoint_file=checkpoint, resume_from=resume_from, cache_path=cache_path)
     print(q_data)
 
     ###### draw points on circle ########
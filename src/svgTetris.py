@@ -34,14 +34,9 @@ class Tetris:
         self.block_id = rand_str()   # block id
         self._create_block()
 
-    def _get_defs(self):
-        defs = self.svg.get_child(child_tag='defs')
-        defs = defs if defs else self.svg.draw(draw_tag('defs'))
-        return defs
-
     def _create_block(self):
         """ create basic tetris block """
-        self.defs_node = self._get_defs()
+        self.defs_node = self.svg.get_defs()
         self._block_tetris(self.svg, self.defs_node, self.get_block_id())
 
     def _block_tetris(self, svg, defs_node, ref_id):
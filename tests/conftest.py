@@ -0,0 +1,6 @@
+# -*- encoding: utf-8 -*-
+""" the modules are run from src, e.g. python svgImageMask.py """
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
@@ -0,0 +1,88 @@
+# -*- encoding: utf-8 -*-
+""" tests of svg.file """
+import numpy as np
+import pytest
+from lxml import etree
+from svg.basic import draw_any
+from svg.file import SVGFileV2, SVGStreamWriter
+
+
+def _leaves(svg):
+    """ drawn elements without children, <use> resolved to its definition """
+    root = svg.get_root()
+    defs = {e.get('id'): e for e in root.iter() if isinstance(e.tag, str) and e.get('id')}
+    href = f'{{{SVGFileV2._xlink}}}href'  # pylint: disable=protected-access
+    out = []
+
+    def walk(e, transforms):
+        if etree.QName(e).localname == 'defs':
+            return
+        transforms = transforms + [e.get('transform')] if e.get('transform') else transforms
+        if etree.QName(e).localname == 'use':
+            walk(defs[e.get(href)[1:]], transforms)
+        elif len(e):
+            for c in e:
+                walk(c, transforms)
+        else:
+            out.append((etree.QName(e).localname, tuple(transforms), tuple(sorted(
+                (k, v) for k, v in e.attrib.items() if k not in ('id', 'transform')))))
+    walk(root, [])
+    return out
+
+
+def _circle_groups(svg, transforms):
+    for i, transform in enumerate(transforms):
+        g = svg.draw(draw_any('g', transform=f'translate({i * 100},0)'))
+        svg.draw_node(g, draw_any('circle', cx=10, cy=10, r=5, fill='red', stroke='blue', transform=transform))
+
+
+def test_instance_subtrees_keeps_inner_transforms(tmp_path):
+    svg = SVGFileV2(str(tmp_path / 'a.svg'), 400, 100)
+    _circle_groups(svg, ['rotate(0)', 'translate(50,50)', 'scale(3)'])
+    before = _leaves(svg)
+    report = svg.instance_subtrees(min_size=0)
+    assert report.uses == 0
+    assert _leaves(svg) == before
+
+
+def test_instance_subtrees_moves_root_transform(tmp_path):
+    svg = SVGFileV2(str(tmp_path / 'b.svg'), 400, 100)
+    _circle_groups(svg, ['scale(3)'] * 3)
+    before = _leaves(svg)
+    report = svg.instance_subtrees(min_size=0)
+    assert (report.symbols, report.uses) == (1, 3)
+    assert _leaves(svg) == before
+
+
+def _drawing(svg):
+    svg.set_title('streamed')
+    cls = svg.style_class({'fill': '#123456'})
+    svg.add_rects([[0, 0, 1, 1], [2, 2, 1, 1]], cls=cls)
+    svg.draw(draw_any('circle', cx=1, cy=2, r=3, fill='red'))
+    svg.add_lines([[0, 0, 5, 5]], stroke='black')
+
+
+def test_stream_matches_in_memory(tmp_path):
+    mem, streamed = tmp_path / 'mem.svg', tmp_path / 'stream.svg'
+    svg = SVGFileV2(str(mem), 10, 10)
+    _drawing(svg)
+    svg.close()
+    with SVGStreamWriter(str(streamed), 10, 10) as svg:
+        _drawing(svg)
+    assert streamed.read_bytes() == mem.read_bytes()
+
+
+def test_tiled_image_matches_in_memory(tmp_path):
+    cv2 = pytest.importorskip('cv2')
+    from svgImageMask import SVGImageMask  # pylint: disable=import-outside-toplevel
+    rgb = np.random.default_rng(0).integers(0, 256, (48, 40, 3), dtype=np.uint8)
+    np.save(tmp_path / 'image.npy', rgb)
+    cv2.imwrite(str(tmp_path / 'image.png'), rgb[..., ::-1])
+    for draw in (lambda m: m.drawStep(palette_size=4), lambda m: m.drawColor(merge='runs')):
+        files = []
+        for image, strip_rows in (('image.png', None), ('image.npy', 16)):
+            files.append(tmp_path / f'{image}.svg')
+            mask = SVGImageMask(str(tmp_path / image), str(files[-1]), step=4, strip_rows=strip_rows)
+            draw(mask)
+            mask.svg.close()
+        assert files[0].read_bytes() == files[1].read_bytes()